@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+/img 与 /dy 端到端基准测试（离线）。
+
+启动本地的微信文章替身和 kukutool 替身，用伪造的 EventContext 驱动
+DefaultEventListener，在不同并发度下统计吞吐量、p50/p99 延迟和内存峰值。
+
+用法：
+    python benchmarks/bench_commands.py
+    python benchmarks/bench_commands.py --command img --concurrency 1 4 16 --images 40 --image-kb 300
+    python benchmarks/bench_commands.py --command dy --requests 64 --latency 0.2
+
+延迟指从提交命令到该命令最后一条回复的时间。默认把发送速率设得很高，
+测量的是下载/解析管线本身，可用 --send-rate 还原真实的限速配置。
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from langbot_plugin.api.entities.builtin.platform import message as platform_message  # noqa: E402
+
+import douyin_parser  # noqa: E402
+from components.event_listener.default import DefaultEventListener  # noqa: E402
+from kukutool_stub import KukutoolStubServer  # noqa: E402
+from wechat_stub import WeChatStubServer  # noqa: E402
+
+
+class FakeEvent:
+    def __init__(self, text: str, sender_id: str, launcher_id: str):
+        self.message_chain = platform_message.MessageChain([platform_message.Plain(text=text)])
+        self.sender_id = sender_id
+        self.launcher_id = launcher_id
+
+
+class FakeEventContext:
+    """只实现监听器用到的接口，记录每条回复的时间。"""
+
+    def __init__(self, text: str, sender_id: str, launcher_id: str):
+        self.event = FakeEvent(text, sender_id, launcher_id)
+        self.replies: list[tuple[float, Any]] = []
+        self.submitted_at = 0.0
+
+    def prevent_default(self):
+        pass
+
+    async def reply(self, message_chain, quote_origin: bool = False):
+        self.replies.append((time.perf_counter(), message_chain))
+
+    @property
+    def latency(self) -> float:
+        return self.replies[-1][0] - self.submitted_at if self.replies else float("nan")
+
+
+class FakePlugin:
+    def __init__(self, config: dict[str, Any]):
+        self.config = config
+
+    def get_config(self) -> dict[str, Any]:
+        return self.config
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return float("nan")
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def build_listener(config: dict[str, Any]) -> DefaultEventListener:
+    listener = DefaultEventListener()
+    listener.plugin = FakePlugin(config)
+    await listener.initialize()
+    # 只测稳态吞吐量，等后台预热完成
+    await listener.ready()
+    return listener
+
+
+async def run_level(
+    listener: DefaultEventListener,
+    messages: list[str],
+    concurrency: int,
+) -> tuple[float, list[FakeEventContext]]:
+    """以 concurrency 个并发会话发送 messages，返回总耗时和各请求的上下文。"""
+    contexts = [
+        FakeEventContext(text, sender_id=f"user{i}", launcher_id=f"group{i % concurrency}")
+        for i, text in enumerate(messages)
+    ]
+    pending = iter(contexts)
+    start = time.perf_counter()
+
+    async def session() -> None:
+        # 每个并发会话串行地发送自己的请求
+        for ctx in pending:
+            ctx.submitted_at = time.perf_counter()
+            await listener.process_message(ctx, is_private=False)
+            for job in listener.jobs.jobs_for(ctx.event.sender_id):
+                await job.finished.wait()
+
+    await asyncio.gather(*(session() for _ in range(concurrency)))
+    return time.perf_counter() - start, contexts
+
+
+def report(label, concurrency, elapsed, contexts, peak, before, after) -> None:
+    upstream = sum(after[k] - before[k] for k in before if k != "bytes")
+    latencies = [ctx.latency for ctx in contexts]
+    print(
+        f"{label:<6}{concurrency:>6}{len(contexts) / elapsed:>14.2f}"
+        f"{percentile(latencies, 50) * 1000:>10.0f}{percentile(latencies, 99) * 1000:>10.0f}"
+        f"{peak / 1024 / 1024:>14.1f}{upstream:>10}"
+    )
+
+
+async def bench(args: argparse.Namespace) -> None:
+    wechat = WeChatStubServer(images=args.images, image_size=args.image_kb * 1024, latency=args.latency).start()
+    kukutool = KukutoolStubServer(latency=args.latency).start()
+    douyin_parser.BASE_URL = kukutool.base_url
+    douyin_parser.SHORT_LINK_HOSTS.add(kukutool.netloc)
+
+    print(
+        f"文章图片 {args.images} 张 × {args.image_kb} KB，上游延迟 {args.latency * 1000:.0f} ms，"
+        f"每档 {args.requests} 个请求"
+    )
+    print(f"{'命令':<6}{'并发':>6}{'吞吐(req/s)':>14}{'p50(ms)':>10}{'p99(ms)':>10}{'内存峰值(MB)':>14}{'上游请求':>10}")
+
+    commands = ["img", "dy"] if args.command == "all" else [args.command]
+    try:
+        for command in commands:
+            for concurrency in args.concurrency:
+                store_dir = tempfile.mkdtemp(prefix="bench_images_")
+                try:
+                    listener = await build_listener({
+                        "image_store_dir": store_dir,
+                        "send_rate": args.send_rate,
+                        "send_burst": args.send_rate,
+                        "send_rate_global": args.send_rate * max(args.concurrency),
+                        "send_burst_global": args.send_rate * max(args.concurrency),
+                        "job_workers": concurrency,
+                        "job_queue_size": args.requests,
+                    })
+                    # 缓存会掩盖上游开销，每档使用不同的链接
+                    douyin_parser.AUTH_CACHE.clear()
+                    douyin_parser.RESULT_CACHE.clear()
+                    if command == "img":
+                        messages = [f"/img {wechat.article_url(f'c{concurrency}a{i}')}" for i in range(args.requests)]
+                        before = dict(wechat.counts)
+                    else:
+                        messages = [f"/dy {kukutool.short_url(f'c{concurrency}v{i}')}" for i in range(args.requests)]
+                        before = dict(kukutool.counts)
+
+                    tracemalloc.start()
+                    elapsed, contexts = await run_level(listener, messages, concurrency)
+                    _, peak = tracemalloc.get_traced_memory()
+                    tracemalloc.stop()
+
+                    after = wechat.counts if command == "img" else kukutool.counts
+                    report(f"/{command}", concurrency, elapsed, contexts, peak, before, after)
+
+                    if command == "dy":
+                        # 同样的链接再发一遍，全部命中解析结果缓存
+                        before = dict(kukutool.counts)
+                        elapsed, contexts = await run_level(listener, messages, concurrency)
+                        report("/dy缓存", concurrency, elapsed, contexts, 0, before, kukutool.counts)
+                    listener.store.close()
+                finally:
+                    shutil.rmtree(store_dir, ignore_errors=True)
+    finally:
+        wechat.stop()
+        kukutool.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--command", choices=["img", "dy", "all"], default="all")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=32, help="每个并发档位的请求数")
+    parser.add_argument("--images", type=int, default=20, help="每篇文章的图片数")
+    parser.add_argument("--image-kb", type=int, default=200, help="每张图片的大小（KB）")
+    parser.add_argument("--latency", type=float, default=0.05, help="替身服务器的响应延迟（秒）")
+    parser.add_argument("--send-rate", type=float, default=1000.0, help="每个会话的发送速率（条/秒）")
+    args = parser.parse_args()
+    asyncio.run(bench(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+抖音解析响应解密基准测试。
+
+对比原来逐字符的去混淆流程（xor_string / block_reverse /
+base64_custom_decode + 每次重新计算密钥）与 decrypt_response_payload
+中基于查找表的字节实现，并先做往返校验：两者对同一密文的结果必须一致。
+
+用法：
+    python benchmarks/bench_decrypt.py [--entries 200] [--rounds 200]
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from kukutool_stub import build_video_result, encrypt_response_payload  # noqa: E402
+
+import douyin_parser  # noqa: E402
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes  # noqa: E402
+from cryptography.hazmat.primitives.padding import PKCS7  # noqa: E402
+
+
+def decrypt_reference(data: str, iv: str) -> dict:
+    """优化前的实现。"""
+    data = douyin_parser.xor_string(data)
+    iv = douyin_parser.xor_string(iv)
+    data = douyin_parser.block_reverse(data)
+    iv = douyin_parser.block_reverse(iv)
+    data = douyin_parser.base64_custom_decode(data)
+    iv = douyin_parser.base64_custom_decode(iv)
+
+    encrypted_bytes = base64.b64decode(data)
+    iv_bytes = base64.b64decode(iv)
+    response_key = hashlib.sha256(douyin_parser.RESPONSE_AES_SECRET.encode("utf-8")).digest()
+    decryptor = Cipher(algorithms.AES(response_key), modes.CBC(iv_bytes)).decryptor()
+    padded = decryptor.update(encrypted_bytes) + decryptor.finalize()
+    unpadder = PKCS7(128).unpadder()
+    return json.loads((unpadder.update(padded) + unpadder.finalize()).decode("utf-8"))
+
+
+def deobfuscate_reference(value: str) -> bytes:
+    """优化前逐字符的去混淆流程。"""
+    return douyin_parser.base64_custom_decode(
+        douyin_parser.block_reverse(douyin_parser.xor_string(value))
+    ).encode("ascii")
+
+
+def check_round_trip(samples: int = 200) -> None:
+    # 以原来的逐字符实现为基准，覆盖空输入和各种不是 8 的倍数的长度
+    rng = random.Random(0)
+    alphabet = douyin_parser.CUSTOM_B64 + "=-_."
+    for length in range(0, 41):
+        value = "".join(rng.choice(alphabet) for _ in range(length))
+        assert douyin_parser.deobfuscate(value) == deobfuscate_reference(value), f"去混淆结果不一致: length={length}"
+        raw = value.encode("ascii")
+        for block_size in (1, 3, 8):
+            assert douyin_parser._block_reverse_bytes(raw, block_size) == douyin_parser.block_reverse(
+                value, block_size
+            ).encode("ascii"), f"按块反转结果不一致: length={length} block_size={block_size}"
+
+    for i in range(samples):
+        payload = build_video_result(f"v{i}", entries=i % 17 + 1)
+        data, iv = encrypt_response_payload(payload)
+        # 覆盖长度不是 8 的倍数的情况
+        for cut in (0, 1, 3, 7):
+            truncated = data[: len(data) - cut] if cut else data
+            expected = deobfuscate_reference(truncated)
+            assert douyin_parser.deobfuscate(truncated) == expected, f"去混淆结果不一致: sample={i} cut={cut}"
+        assert douyin_parser.decrypt_response_payload(data, iv) == payload
+        assert decrypt_reference(data, iv) == payload
+
+
+def bench(func, data: str, iv: str, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(data, iv)
+    return (time.perf_counter() - start) / rounds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, nargs="*", default=[4, 50, 200, 1000], help="video_fullinfo 条目数")
+    parser.add_argument("--rounds", type=int, default=100)
+    args = parser.parse_args()
+
+    check_round_trip()
+    print("往返校验通过")
+
+    print(f"{'条目':>6}{'密文(KB)':>10}{'原实现(ms)':>12}{'查找表(ms)':>12}{'加速':>8}")
+    for entries in args.entries:
+        data, iv = encrypt_response_payload(build_video_result("bench", entries=entries))
+        baseline = bench(decrypt_reference, data, iv, args.rounds)
+        fast = bench(douyin_parser.decrypt_response_payload, data, iv, args.rounds)
+        print(
+            f"{entries:>6}{len(data) / 1024:>10.1f}{baseline * 1000:>12.3f}"
+            f"{fast * 1000:>12.3f}{baseline / fast:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
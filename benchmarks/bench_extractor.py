@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文章图片提取基准测试。
+
+对比 lxml 事件式提取与原来的 BeautifulSoup 完整解析，并校验两者结果一致。
+
+用法：
+    python benchmarks/bench_extractor.py                  # 使用生成的大型文章样本
+    python benchmarks/bench_extractor.py page1.html ...   # 使用保存下来的文章页面
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from components.event_listener.article_extractor import (  # noqa: E402
+    extract_images,
+    extract_images_bs4,
+)
+
+
+def build_article(images: int, paragraphs: int) -> str:
+    """生成结构接近 mp.weixin.qq.com 的文章页面。"""
+    head = (
+        "<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>样例文章</title>"
+        + "".join(f"<script>var cfg{i} = {{a: '<img src=\"http://x\">', b: {i}}};</script>" for i in range(40))
+        + "<style>" + "body{margin:0}" * 500 + "</style></head><body>"
+        + "<div id=\"js_article\"><div class=\"rich_media_meta\">"
+        + "<img src=\"data:image/gif;base64,R0lGOD\" class=\"avatar\"></div>"
+    )
+    blocks = []
+    for i in range(paragraphs):
+        blocks.append(
+            f"<section style=\"margin:0 8px\"><p><span style=\"font-size:15px\">第 {i} 段正文，"
+            + "这里是一些用于填充的文字。" * 8
+            + "</span></p></section>"
+        )
+        if i % max(1, paragraphs // images) == 0:
+            blocks.append(
+                f"<p><img class=\"rich_pages wxw-img\" data-ratio=\"0.75\" data-w=\"1080\" "
+                f"data-src=\"https://mmbiz.qpic.cn/mmbiz_jpg/abc{i}/640?wx_fmt=jpeg\" "
+                f"src=\"data:image/svg+xml,%3Csvg%3E\"></p>"
+            )
+    content = "<div id=\"js_content\">" + "".join(blocks) + "</div>"
+    footer = "<div class=\"qr_code_pc\"><img src=\"https://res.wx.qq.com/mmbizwap/qrcode.png\"></div>"
+    return head + content + footer + "</div></body></html>"
+
+
+def bench(func, html: str, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(html)
+    return (time.perf_counter() - start) / rounds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", help="保存下来的文章 HTML 文件")
+    parser.add_argument("--images", type=int, default=120, help="生成样本的图片数量")
+    parser.add_argument("--paragraphs", type=int, default=1500, help="生成样本的段落数量")
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    fixtures = []
+    for path in args.files:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            fixtures.append((os.path.basename(path), f.read()))
+    if not fixtures:
+        fixtures.append(("generated", build_article(args.images, args.paragraphs)))
+
+    print(f"{'样本':<20}{'大小(KB)':>10}{'图片':>6}{'bs4(ms)':>10}{'lxml(ms)':>10}{'加速':>8}")
+    for name, html in fixtures:
+        expected = extract_images_bs4(html)
+        actual = extract_images(html)
+        if actual != expected:
+            raise SystemExit(f"{name}: 提取结果不一致\n  bs4:  {expected}\n  lxml: {actual}")
+        baseline = bench(extract_images_bs4, html, args.rounds)
+        fast = bench(extract_images, html, args.rounds)
+        print(
+            f"{name:<20}{len(html.encode()) / 1024:>10.0f}{len(actual):>6}"
+            f"{baseline * 1000:>10.1f}{fast * 1000:>10.1f}{baseline / fast:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+事件循环阻塞检测基准测试（离线）。
+
+1. 归因：在带命令名的任务中注入几种阻塞（在事件循环里同步调用 kukutool
+   替身服务器的 parse_video_url、time.sleep、CPU 计算），检查检测到的阻塞
+   时长、命令、阶段和最内层调用栈；
+2. 开销：不断创建任务、任务间频繁切换的纯调度负载下，比较关闭/开启检测的
+   吞吐量（开启时只多一个心跳任务）。
+
+用法：
+    python benchmarks/bench_loop_monitor.py
+    python benchmarks/bench_loop_monitor.py --threshold-ms 100 --switches 500000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import douyin_parser  # noqa: E402
+from kukutool_stub import KukutoolStubServer  # noqa: E402
+from loop_monitor import LoopMonitor, run_command  # noqa: E402
+from stage_metrics import METRICS  # noqa: E402
+
+
+def busy(seconds: float) -> int:
+    deadline = time.perf_counter() + seconds
+    count = 0
+    while time.perf_counter() < deadline:
+        count += sum(range(100))
+    return count
+
+
+async def blocking_parse() -> None:
+    with METRICS.timer("dy.total"):
+        # 错误示范：在协程中直接调用同步解析
+        douyin_parser.parse_video_url("https://www.douyin.com/user/blocking")
+
+
+async def blocking_sleep() -> None:
+    with METRICS.timer("img.article_fetch"):
+        time.sleep(0.3)
+
+
+async def blocking_cpu() -> None:
+    await asyncio.sleep(0.01)
+    with METRICS.timer("img.article_parse"):
+        busy(0.4)
+
+
+async def attribution(monitor: LoopMonitor, stub: KukutoolStubServer) -> None:
+    douyin_parser.BASE_URL = stub.base_url
+    douyin_parser.RESULT_CACHE.configure(ttl=0)
+    monitor.start()
+    cases = [("/dy", blocking_parse), ("/img", blocking_sleep), ("/img", blocking_cpu)]
+    print(f"{'注入的阻塞':<16}{'检测时长(ms)':>12}  命令 / 阶段 / 最内层调用")
+    for command, func in cases:
+        before = len(monitor.stalls)
+        await asyncio.create_task(run_command(command, func))
+        # 等心跳记录这次阻塞
+        await asyncio.sleep(monitor.interval * 3)
+        for stall in list(monitor.stalls)[before:]:
+            frame = stall.stack[-1].strip().splitlines()[0] if stall.stack else "（无）"
+            print(f"{func.__name__:<16}{stall.duration * 1000:>12.0f}  {stall.command} / {stall.stage} / {frame}")
+        if len(monitor.stalls) == before:
+            print(f"{func.__name__:<16}{'未检测到':>12}")
+    monitor.stop()
+
+
+async def switch_load(tasks: int, switches: int, per_task: int = 20) -> float:
+    """每批并发 tasks 个任务，每个任务切换 per_task 次，返回每秒切换次数。"""
+
+    async def worker() -> None:
+        for _ in range(per_task):
+            await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    for _ in range(max(1, switches // (tasks * per_task))):
+        await asyncio.gather(*(asyncio.ensure_future(worker()) for _ in range(tasks)))
+    return switches / (time.perf_counter() - started)
+
+
+async def overhead(monitor: LoopMonitor, tasks: int, switches: int, rounds: int) -> None:
+    print(f"\n每批 {tasks} 个任务，共 {switches} 次切换，交替测 {rounds} 轮取最好成绩")
+    results = {False: 0.0, True: 0.0}
+    for _ in range(rounds):
+        for enabled in (False, True):
+            if enabled:
+                monitor.start()
+            results[enabled] = max(results[enabled], await switch_load(tasks, switches))
+            monitor.stop()
+    off, on = results[False], results[True]
+    print(f"关闭 {off:,.0f} 次/秒，开启 {on:,.0f} 次/秒，开销 {(off - on) / off:.1%}")
+
+
+async def bench(args: argparse.Namespace) -> None:
+    monitor = LoopMonitor(threshold=args.threshold_ms / 1000)
+    stub = KukutoolStubServer(latency=0.25).start()
+    try:
+        await attribution(monitor, stub)
+    finally:
+        stub.stop()
+    await overhead(monitor, args.tasks, args.switches, args.rounds)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threshold-ms", type=float, default=100)
+    parser.add_argument("--tasks", type=int, default=100)
+    parser.add_argument("--switches", type=int, default=200000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    # 只看汇总表，不输出每次阻塞的完整日志
+    logging.getLogger("loop_monitor").setLevel(logging.ERROR)
+    asyncio.run(bench(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+kukutool 对冲请求与熔断基准测试（离线）。
+
+1. 长尾：替身服务器以一定概率变慢，分别在关闭/开启对冲时串行解析，
+   比较 p50/p95/p99 延迟和额外请求数；
+2. 故障：替身服务器开始返回 503，统计熔断打开前后的失败耗时；
+   恢复后等待后台探测关闭熔断器，确认解析重新成功。
+
+用法：
+    python benchmarks/bench_resilience.py
+    python benchmarks/bench_resilience.py --requests 400 --latency 0.02 --tail-latency 1.0 --tail-ratio 0.01
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import douyin_parser  # noqa: E402
+import http_transport  # noqa: E402
+import resilience  # noqa: E402
+from kukutool_stub import KukutoolStubServer  # noqa: E402
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+async def run_tail(stub: KukutoolStubServer, requests: int, hedge: bool) -> None:
+    douyin_parser.configure_resilience(hedge=hedge)
+    douyin_parser.AUTH_LATENCY = resilience.LatencyTracker()
+    douyin_parser.PARSE_LATENCY = resilience.LatencyTracker()
+    before = dict(stub.counts)
+    latencies = []
+    for i in range(requests):
+        # 每次都重新认证，auth 和 parse 两个请求都经过对冲
+        douyin_parser.AUTH_CACHE.clear()
+        started = time.perf_counter()
+        await douyin_parser.parse_video_url_async(f"https://www.douyin.com/user/tail{i}")
+        latencies.append(time.perf_counter() - started)
+    upstream = sum(stub.counts[k] - before[k] for k in ("auth", "parse"))
+    print(
+        f"{'开启' if hedge else '关闭':<6}{percentile(latencies, 50) * 1000:>10.0f}"
+        f"{percentile(latencies, 95) * 1000:>10.0f}{percentile(latencies, 99) * 1000:>10.0f}"
+        f"{max(latencies) * 1000:>10.0f}{upstream / (requests * 2) - 1:>12.1%}"
+    )
+
+
+async def run_outage(stub: KukutoolStubServer, reset: float) -> None:
+    douyin_parser.configure_resilience(hedge=True, failure_threshold=5, reset_timeout=reset)
+    stub.failing = True
+    print("\n上游返回 503：")
+    for i in range(8):
+        douyin_parser.AUTH_CACHE.clear()
+        started = time.perf_counter()
+        try:
+            await douyin_parser.parse_video_url_async(f"https://www.douyin.com/user/down{i}")
+            outcome = "成功"
+        except douyin_parser.DouyinParseError as exc:
+            outcome = str(exc)
+        print(f"  第 {i + 1} 次 {(time.perf_counter() - started) * 1000:>6.0f} ms  {outcome}")
+
+    stub.failing = False
+    started = time.perf_counter()
+    while douyin_parser.BREAKER.state != resilience.CircuitBreaker.CLOSED:
+        await asyncio.sleep(0.05)
+    print(f"上游恢复后 {time.perf_counter() - started:.1f}s 内由后台探测关闭熔断器")
+    result = await douyin_parser.parse_video_url_async("https://www.douyin.com/user/recovered")
+    print(f"恢复后解析：{result['title']}")
+
+
+async def bench(args: argparse.Namespace) -> None:
+    stub = KukutoolStubServer(
+        latency=args.latency, tail_latency=args.tail_latency, tail_ratio=args.tail_ratio
+    ).start()
+    douyin_parser.BASE_URL = stub.base_url
+    douyin_parser.RESULT_CACHE.configure(ttl=0)
+    print(
+        f"上游延迟 {args.latency * 1000:.0f} ms，{args.tail_ratio:.0%} 的请求变慢到 "
+        f"{args.tail_latency * 1000:.0f} ms，串行 {args.requests} 次解析"
+    )
+    print(f"{'对冲':<6}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'max(ms)':>10}{'额外请求':>12}")
+    try:
+        await run_tail(stub, args.requests, hedge=False)
+        await run_tail(stub, args.requests, hedge=True)
+        await run_outage(stub, args.reset)
+    finally:
+        stub.stop()
+        await http_transport.get_transport().async_session("douyin").close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--tail-latency", type=float, default=0.8)
+    parser.add_argument("--tail-ratio", type=float, default=0.02)
+    parser.add_argument("--reset", type=float, default=1.0, help="熔断后首次探测的等待时间（秒）")
+    args = parser.parse_args()
+    asyncio.run(bench(args))
+
+
+if __name__ == "__main__":
+    main()
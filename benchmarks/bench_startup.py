@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+插件冷启动基准测试（离线）。
+
+每轮启动一个新的子进程，模拟插件运行时加载插件：
+1. 先导入 LangBot SDK（运行时在加载插件之前已经导入，不计入插件耗时）；
+2. 计时 import components.event_listener.default；
+3. 计时 initialize() 返回，此后插件即可响应消息，用 /id 验证；
+4. 计时后台预热完成（重量级模块导入和 HTTP/解析组件初始化）；
+5. 计时预热完成后第一条 /dy（kukutool 替身服务器，由父进程启动）。
+
+--no-warm-up 关闭后台预热，组件在第一条 /dy 到达时加载，第 5 步包含加载时间。
+
+最后用 python -X importtime 统计导入插件时各顶层包的耗时，找出启动路径上
+最慢的依赖。
+
+用法：
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 10 --top 12
+    python benchmarks/bench_startup.py --no-warm-up
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 插件运行时加载插件前已经导入的 SDK 模块
+SDK_PRELOAD = (
+    "from langbot_plugin.api.definition.components.common.event_listener import EventListener\n"
+    "from langbot_plugin.api.entities import events, context\n"
+    "from langbot_plugin.api.entities.builtin.platform import message\n"
+    "from langbot_plugin.api.entities.builtin.provider import message\n"
+)
+
+
+class FakeEventContext:
+    """只实现插件用到的接口，不依赖 bench_commands（它会提前导入重量级模块）。"""
+
+    def __init__(self, text: str):
+        from langbot_plugin.api.entities.builtin.platform import message as platform_message
+
+        self.event = type("Event", (), {})()
+        self.event.message_chain = platform_message.MessageChain([platform_message.Plain(text=text)])
+        self.event.sender_id = "user"
+        self.event.launcher_id = "group"
+        self.replies = []
+        self.done = asyncio.Event()
+
+    def prevent_default(self):
+        pass
+
+    async def reply(self, message_chain, quote_origin: bool = False):
+        self.replies.append(message_chain)
+        self.done.set()
+
+
+class FakePlugin:
+    def __init__(self, config: dict):
+        self.config = config
+
+    def get_config(self) -> dict:
+        return self.config
+
+
+async def child(base_url: str, store_dir: str, warm_up: bool) -> dict:
+    exec(SDK_PRELOAD, {})
+    timings = {}
+    modules = len(sys.modules)
+
+    started = time.perf_counter()
+    from components.event_listener.default import DefaultEventListener
+
+    timings["import_ms"] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    listener = DefaultEventListener()
+    listener.plugin = FakePlugin({"image_store_dir": store_dir, "loop_monitor": False, "warm_up": warm_up})
+    await listener.initialize()
+    timings["initialize_ms"] = (time.perf_counter() - started) * 1000
+    timings["modules_after_init"] = len(sys.modules) - modules
+
+    started = time.perf_counter()
+    context = FakeEventContext("/id")
+    await listener.process_message(context, is_private=True)
+    timings["first_reply_ms"] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    ready = getattr(listener, "ready", None)
+    if ready is not None and warm_up:
+        await ready()
+    timings["warm_up_ms"] = (time.perf_counter() - started) * 1000
+    timings["modules_after_warm_up"] = len(sys.modules) - modules
+
+    # 关闭预热时导入 douyin_parser 也是首条 /dy 加载的一部分，计入耗时
+    started = time.perf_counter()
+    import douyin_parser
+
+    douyin_parser.BASE_URL = base_url
+    context = FakeEventContext("/dy https://www.douyin.com/user/startup")
+    await listener.process_message(context, is_private=True)
+    while not any("最清晰" in str(chain) or "失败" in str(chain) for chain in context.replies):
+        context.done.clear()
+        await context.done.wait()
+    timings["first_dy_ms"] = (time.perf_counter() - started) * 1000
+    return timings
+
+
+def import_breakdown(top: int) -> list[tuple[str, float]]:
+    """导入插件时各顶层包的自身耗时之和（毫秒）。"""
+    code = SDK_PRELOAD + "import sys\nsys.stderr.write('@@plugin\\n')\nimport components.event_listener.default\n"
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stderr
+    totals: dict[str, float] = {}
+    for line in output.split("@@plugin\n", 1)[1].splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        if package == "components":
+            package = name.strip()
+        totals[package] = totals.get(package, 0.0) + int(self_us) / 1000
+    return sorted(totals.items(), key=lambda item: -item[1])[:top]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--no-warm-up", action="store_true", help="关闭后台预热，组件在第一条命令到达时加载")
+    parser.add_argument("--child", nargs=2, metavar=("BASE_URL", "STORE_DIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        sys.path.insert(0, ROOT)
+        print(json.dumps(asyncio.run(child(*args.child, warm_up=not args.no_warm_up))))
+        return
+
+    import shutil
+    import tempfile
+
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, BENCH_DIR)
+    from kukutool_stub import KukutoolStubServer
+
+    stub = KukutoolStubServer(latency=0.02).start()
+    store_dir = tempfile.mkdtemp(prefix="bench_startup_")
+    runs = []
+    try:
+        for _ in range(args.runs):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", stub.base_url, store_dir]
+                + (["--no-warm-up"] if args.no_warm_up else []),
+                cwd=ROOT, capture_output=True, text=True, check=True,
+            ).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+    finally:
+        stub.stop()
+        shutil.rmtree(store_dir, ignore_errors=True)
+
+    print(f"{args.runs} 次冷启动的中位数：")
+    labels = {
+        "import_ms": "导入插件(ms)",
+        "initialize_ms": "initialize(ms)",
+        "first_reply_ms": "首条 /id 回复(ms)",
+        "warm_up_ms": "后台预热剩余(ms)",
+        "first_dy_ms": "首条 /dy(ms)" if args.no_warm_up else "预热后首条 /dy(ms)",
+        "modules_after_init": "initialize 后新增模块数",
+        "modules_after_warm_up": "预热后新增模块数",
+    }
+    for key, label in labels.items():
+        print(f"  {label:<24}{statistics.median(run[key] for run in runs):>10.1f}")
+
+    print(f"\n导入插件时最慢的 {args.top} 个包（自身耗时之和）：")
+    for package, ms in import_breakdown(args.top):
+        print(f"  {package:<48}{ms:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
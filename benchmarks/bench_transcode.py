@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片转码基准测试（离线，需要 Pillow）。
+
+生成一批大尺寸的 PNG 长图、JPEG 照片和 GIF 动图放入临时 ImageStore，
+分别用不同的进程数转码，统计耗时、节省的字节数，以及转码期间事件循环的
+最大调度延迟（衡量是否阻塞事件循环）。第一行是在事件循环线程中直接转码
+的对照组。
+
+用法：
+    python benchmarks/bench_transcode.py
+    python benchmarks/bench_transcode.py --images 24 --max-dimension 1280 --format WEBP --workers 1 2 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from components.event_listener import image_transcoder  # noqa: E402
+from components.event_listener.image_downloader import DownloadResult  # noqa: E402
+from components.event_listener.image_store import ImageStore  # noqa: E402
+from components.event_listener.image_transcoder import ImageTranscoder, transcode_file  # noqa: E402
+
+try:
+    from PIL import Image, ImageDraw
+except ImportError:
+    Image = None
+
+
+def make_png(rng: random.Random) -> bytes:
+    """带文字块、色带和截图区域的信息图长图。"""
+    image = Image.new("RGB", (1600, 4800), "white")
+    image.paste(Image.effect_noise((1600, 1200), 30 + rng.random() * 20).convert("RGB"), (0, 3600))
+    draw = ImageDraw.Draw(image)
+    for y in range(0, 3600, 60):
+        color = tuple(rng.randrange(256) for _ in range(3))
+        draw.rectangle((40, y, 1560, y + 40), fill=color)
+        for x in range(60, 1500, 24):
+            draw.text((x, y + 12), rng.choice("数据图表增长"), fill=(0, 0, 0))
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def make_jpeg(rng: random.Random) -> bytes:
+    """带噪声的渐变照片。"""
+    noise = Image.effect_noise((4000, 3000), 40).convert("RGB")
+    gradient = Image.linear_gradient("L").resize((4000, 3000)).convert("RGB")
+    image = Image.blend(noise, gradient, 0.5 + rng.random() * 0.3)
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=95)
+    return buffer.getvalue()
+
+
+def make_gif(rng: random.Random) -> bytes:
+    frames = []
+    for i in range(12):
+        frame = Image.new("RGB", (1200, 1200), tuple(rng.randrange(256) for _ in range(3)))
+        ImageDraw.Draw(frame).ellipse((i * 60, i * 60, i * 60 + 400, i * 60 + 400), fill=(255, 255, 255))
+        frames.append(frame.convert("P"))
+    buffer = io.BytesIO()
+    frames[0].save(buffer, "GIF", save_all=True, append_images=frames[1:], duration=80, loop=0)
+    return buffer.getvalue()
+
+
+def make_images(count: int) -> list[bytes]:
+    rng = random.Random(42)
+    makers = [make_png, make_jpeg, make_gif]
+    return [makers[index % len(makers)](rng) for index in range(count)]
+
+
+def build_store(root: str, images: list[bytes]) -> tuple[ImageStore, list[DownloadResult]]:
+    """每轮使用新的 ImageStore，避免命中上一轮的转码结果。"""
+    store = ImageStore(root=root, max_bytes=0, max_age=0)
+    results = []
+    for index, data in enumerate(images):
+        digest = hashlib.md5(data).hexdigest()
+        url = f"bench://{index}"
+        path = store.put(url, data, digest)
+        results.append(DownloadResult(index=index, url=url, status_code=200, md5=digest, size=len(data), path=path))
+    return store, results
+
+
+async def watch_lag(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """返回事件循环的最大调度延迟（秒）。"""
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
+
+
+async def run(results: list[DownloadResult], transcode) -> tuple[float, int, float]:
+    stop = asyncio.Event()
+    watcher = asyncio.ensure_future(watch_lag(stop))
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    outputs = await transcode(results)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    lag = await watcher
+    return elapsed, sum(item.saved for item in outputs), lag
+
+
+async def bench(args: argparse.Namespace) -> None:
+    root = tempfile.mkdtemp(prefix="bench_transcode_")
+    try:
+        images = make_images(args.images)
+        store, results = build_store(os.path.join(root, "inline"), images)
+        total = sum(item.size for item in results)
+        print(
+            f"{len(results)} 张图片（PNG 长图 / JPEG 照片 / GIF 动图）共 {total / 1024 / 1024:.1f} MB，"
+            f"长边上限 {args.max_dimension}，格式 {args.format}，质量 {args.quality}"
+        )
+        print(f"{'方式':<12}{'耗时(s)':>10}{'张/秒':>10}{'节省':>14}{'最大循环延迟(ms)':>20}")
+
+        # 对照组：在事件循环线程中直接转码
+        async def inline(items):
+            outputs = []
+            for item in items:
+                tmp = store.temp_path()
+                output = transcode_file(item.path, tmp, args.max_dimension, args.format, args.quality)
+                outputs.append(item if output is None else DownloadResult(
+                    index=item.index, url=item.url, status_code=200, md5=output[1],
+                    size=output[0], saved=item.size - output[0],
+                ))
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+            return outputs
+
+        elapsed, saved, lag = await run(results, inline)
+        print(f"{'事件循环内':<12}{elapsed:>10.2f}{len(results) / elapsed:>10.1f}{saved / total:>14.1%}{lag * 1000:>20.0f}")
+        store.close()
+
+        for run_index, workers in enumerate(args.workers):
+            store, results = build_store(os.path.join(root, f"run{run_index}"), images)
+            transcoder = ImageTranscoder(
+                store, max_dimension=args.max_dimension, fmt=args.format,
+                quality=args.quality, min_bytes=0, workers=workers,
+            )
+            # 预先启动子进程，不把进程启动时间算进去
+            await asyncio.gather(*(
+                asyncio.get_running_loop().run_in_executor(transcoder._pool(), os.getpid) for _ in range(workers)
+            ))
+
+            async def pooled(items):
+                return await asyncio.gather(*(transcoder.transcode(item) for item in items))
+
+            try:
+                elapsed, saved, lag = await run(results, pooled)
+                label = f"{workers} 进程"
+                print(f"{label:<12}{elapsed:>10.2f}{len(results) / elapsed:>10.1f}{saved / total:>14.1%}{lag * 1000:>20.0f}")
+                # 再转码一次，应全部命中 ImageStore 中的转码结果
+                elapsed, _, _ = await run(results, pooled)
+                print(f"{'  缓存命中':<12}{elapsed:>10.2f}")
+            finally:
+                transcoder.shutdown()
+                store.close()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=12)
+    parser.add_argument("--max-dimension", type=int, default=image_transcoder.DEFAULT_MAX_DIMENSION)
+    parser.add_argument("--format", default="JPEG")
+    parser.add_argument("--quality", type=int, default=image_transcoder.DEFAULT_QUALITY)
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, os.cpu_count() or 1}))
+    args = parser.parse_args()
+    if Image is None:
+        raise SystemExit("需要安装 Pillow：pip install Pillow")
+    asyncio.run(bench(args))
+
+
+if __name__ == "__main__":
+    main()
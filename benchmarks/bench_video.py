@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+视频分段并行下载基准测试（离线）。
+
+启动一个模拟高延迟 CDN 的本地服务器：每个请求先等待固定延迟，每个连接
+限速发送。分别用不同的分段数下载同一个视频，比较吞吐量；另外校验
+不支持 Range 时的单连接回退和中断后的断点续传，三种情况都核对文件内容。
+
+用法：
+    python benchmarks/bench_video.py
+    python benchmarks/bench_video.py --size-mb 32 --latency 0.2 --conn-kbps 2048 --segments 1 2 4 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import http_transport  # noqa: E402
+from components.event_listener.video_downloader import VideoDownloader  # noqa: E402
+
+
+class VideoStubServer:
+    """按连接限速、可选支持 Range 的视频服务器。"""
+
+    def __init__(self, size: int, latency: float, bytes_per_second: int, ranges: bool = True):
+        self.data = os.urandom(size)
+        self.latency = latency
+        self.bytes_per_second = bytes_per_second
+        self.ranges = ranges
+        self.requests = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/video.mp4?sig=bench"
+
+    def start(self) -> "VideoStubServer":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                stub.requests += 1
+                time.sleep(stub.latency)
+                data = stub.data
+                header = self.headers.get("Range")
+                if stub.ranges and header and header.startswith("bytes="):
+                    start, _, end = header[6:].partition("-")
+                    start, end = int(start), min(int(end or len(data) - 1), len(data) - 1)
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+                    body = memoryview(data)[start:end + 1]
+                else:
+                    self.send_response(200)
+                    body = memoryview(data)
+                self.send_header("Content-Type", "video/mp4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                # 每 50ms 发送一批，模拟单连接带宽上限
+                step = max(1, stub.bytes_per_second // 20)
+                try:
+                    for offset in range(0, len(body), step):
+                        self.wfile.write(body[offset:offset + step])
+                        time.sleep(0.05)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        return Handler
+
+
+async def timed_download(root: str, url: str, segments: int):
+    downloader = VideoDownloader(root=root, segments=segments, max_bytes=0, keep_seconds=0)
+    return await downloader.download(url)
+
+
+def digest_of(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.md5(f.read()).hexdigest()
+
+
+async def bench(args: argparse.Namespace) -> None:
+    size = int(args.size_mb * 1024 * 1024)
+    server = VideoStubServer(size, args.latency, args.conn_kbps * 1024).start()
+    expected = hashlib.md5(server.data).hexdigest()
+    root = tempfile.mkdtemp(prefix="bench_videos_")
+    print(f"视频 {args.size_mb} MB，请求延迟 {args.latency * 1000:.0f} ms，单连接 {args.conn_kbps} KB/s")
+    print(f"{'分段':>4}{'耗时(s)':>10}{'吞吐(MB/s)':>12}{'加速':>8}")
+    try:
+        baseline = None
+        for segments in args.segments:
+            shutil.rmtree(root, ignore_errors=True)
+            result = await timed_download(root, server.url, segments)
+            if digest_of(result.path) != expected:
+                raise SystemExit(f"{segments} 段下载的文件内容不一致")
+            baseline = baseline or result.elapsed
+            print(
+                f"{result.segments:>4}{result.elapsed:>10.2f}{size / result.elapsed / 1024 / 1024:>12.2f}"
+                f"{baseline / result.elapsed:>7.1f}x"
+            )
+
+        # 中断后续传：下载到一半时取消，再次下载应从断点继续
+        shutil.rmtree(root, ignore_errors=True)
+        downloader = VideoDownloader(root=root, segments=max(args.segments), max_bytes=0, keep_seconds=0)
+        task = asyncio.ensure_future(downloader.download(server.url))
+        await asyncio.sleep(args.latency * 2 + size / (args.conn_kbps * 1024 * max(args.segments)) / 2)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        result = await downloader.download(server.url)
+        if digest_of(result.path) != expected:
+            raise SystemExit("断点续传后的文件内容不一致")
+        print(f"断点续传：已完成 {result.resumed_bytes / size:.0%} 后继续，耗时 {result.elapsed:.2f}s，内容一致")
+    finally:
+        server.stop()
+
+    # 不支持 Range 时回退单连接
+    server = VideoStubServer(min(size, 4 * 1024 * 1024), args.latency, args.conn_kbps * 1024, ranges=False).start()
+    try:
+        shutil.rmtree(root, ignore_errors=True)
+        result = await timed_download(root, server.url, max(args.segments))
+        if digest_of(result.path) != hashlib.md5(server.data).hexdigest() or result.segments != 1:
+            raise SystemExit("单连接回退下载结果不正确")
+        print(f"不支持 Range：单连接下载 {result.size / 1024 / 1024:.0f} MB，耗时 {result.elapsed:.2f}s，内容一致")
+    finally:
+        server.stop()
+        shutil.rmtree(root, ignore_errors=True)
+        await http_transport.get_transport().async_session("video").close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=float, default=16)
+    parser.add_argument("--latency", type=float, default=0.15, help="每个请求的首字节延迟（秒）")
+    parser.add_argument("--conn-kbps", type=int, default=2048, help="单连接带宽（KB/s）")
+    parser.add_argument("--segments", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+    asyncio.run(bench(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+kukutool v3 协议服务端一侧的对照实现，供基准测试构造响应数据，
+以及一个可在本地启动的接口替身（KukutoolStubServer）。
+
+与 douyin_parser 中的客户端逻辑互为逆过程：JSON -> AES-CBC 加密 -> 标准
+base64 -> 映射到自定义字母表 -> 按 8 字符块反转 -> 异或。
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes  # noqa: E402
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM  # noqa: E402
+from cryptography.hazmat.primitives.padding import PKCS7  # noqa: E402
+
+import douyin_parser  # noqa: E402
+
+_STANDARD_TO_CUSTOM = str.maketrans(douyin_parser.STANDARD_B64, douyin_parser.CUSTOM_B64)
+
+
+def obfuscate(value: str) -> str:
+    """deobfuscate 的逆过程（块反转与异或都是自身的逆）。"""
+    value = value.translate(_STANDARD_TO_CUSTOM)
+    value = douyin_parser.block_reverse(value)
+    return douyin_parser.xor_string(value)
+
+
+def encrypt_response_payload(data: dict[str, Any]) -> tuple[str, str]:
+    """返回与 parse 接口相同格式的 (data, iv)。"""
+    key = hashlib.sha256(douyin_parser.RESPONSE_AES_SECRET.encode("utf-8")).digest()
+    iv = os.urandom(16)
+    padder = PKCS7(128).padder()
+    padded = padder.update(json.dumps(data, ensure_ascii=False).encode("utf-8")) + padder.finalize()
+    encryptor = Cipher(algorithms.AES(key), modes.CBC(iv)).encryptor()
+    encrypted = encryptor.update(padded) + encryptor.finalize()
+    return (
+        obfuscate(base64.b64encode(encrypted).decode("ascii")),
+        obfuscate(base64.b64encode(iv).decode("ascii")),
+    )
+
+
+def build_video_result(video_id: str, entries: int = 4) -> dict[str, Any]:
+    """构造一个包含 entries 个清晰度的解析结果。"""
+    qualities = ["540p", "720p", "1080p", "超高清"]
+    return {
+        "title": f"测试视频 {video_id}",
+        "url": f"https://cdn.example.com/{video_id}/default.mp4",
+        "videos": [
+            {
+                "video_fullinfo": [
+                    {
+                        "type": qualities[i % len(qualities)],
+                        "size": (i + 1) * 1024 * 1024,
+                        "url": f"https://cdn.example.com/{video_id}/{i}.mp4?sign={'x' * 96}",
+                    }
+                    for i in range(entries)
+                ]
+            }
+        ],
+    }
+
+
+class KukutoolStubServer:
+    """
+    本地的 kukutool v3 接口替身。
+
+    实现 auth 与 parse 两个接口：parse 请求体按 AES-GCM 解密校验，
+    响应按 AES-CBC 加密并混淆，与线上协议一致。
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        entries: int = 4,
+        tail_latency: float = 0.0,
+        tail_ratio: float = 0.0,
+    ):
+        self.latency = latency
+        self.entries = entries
+        # 以 tail_ratio 的概率用 tail_latency 代替 latency，模拟长尾
+        self.tail_latency = tail_latency
+        self.tail_ratio = tail_ratio
+        # 为 True 时所有 POST 返回 503，模拟上游故障
+        self.failing = False
+        self.counts = {"auth": 0, "parse": 0, "redirect": 0}
+        self._auth: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def netloc(self) -> str:
+        return urlsplit(self.base_url).netloc
+
+    def short_url(self, token: str) -> str:
+        """模拟 v.douyin.com 短链接，跳转到带视频 ID 的页面（需把 netloc 加入 SHORT_LINK_HOSTS）。"""
+        return f"{self.base_url}/s/{token}/"
+
+    def start(self) -> "KukutoolStubServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def handle(self):
+                # 对冲请求中落败的一方会被客户端直接断开
+                try:
+                    super().handle()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def _send_json(self, payload: dict[str, Any]) -> None:
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                # 短链接跳转：/s/<token>/ -> /share/video/<数字 ID>/
+                if not self.path.startswith("/s/"):
+                    self.send_error(404)
+                    return
+                token = self.path[3:].strip("/")
+                video_id = int(hashlib.sha1(token.encode()).hexdigest()[:12], 16) + 10**15
+                with stub._lock:
+                    stub.counts["redirect"] += 1
+                self.send_response(302)
+                self.send_header("Location", f"{stub.base_url}/share/video/{video_id}/?region=CN")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                delay = stub.tail_latency if random.random() < stub.tail_ratio else stub.latency
+                if delay:
+                    time.sleep(delay)
+                if stub.failing:
+                    self.send_error(503)
+                    return
+
+                if self.path == douyin_parser.AUTH_ROUTE:
+                    auth_key, auth_seed = os.urandom(8).hex(), os.urandom(8).hex()
+                    with stub._lock:
+                        stub.counts["auth"] += 1
+                        stub._auth[auth_key] = auth_seed
+                    self._send_json({
+                        douyin_parser.ACTIVE_PROFILE["auth_key_field"]: auth_key,
+                        douyin_parser.ACTIVE_PROFILE["auth_seed_field"]: auth_seed,
+                    })
+                    return
+
+                if self.path != douyin_parser.PARSE_ROUTE:
+                    self.send_error(404)
+                    return
+
+                profile = douyin_parser.ACTIVE_PROFILE
+                with stub._lock:
+                    stub.counts["parse"] += 1
+                    auth_seed = stub._auth.get(body.get(profile["parse_key_field"], ""))
+                if auth_seed is None:
+                    self._send_json({"status": 1, "reason": "auth_invalid"})
+                    return
+                key = douyin_parser.derive_request_key(body[profile["parse_key_field"]], auth_seed)
+                params = json.loads(AESGCM(key).decrypt(
+                    base64.b64decode(body[profile["parse_iv_field"]]),
+                    base64.b64decode(body[profile["parse_payload_field"]]),
+                    None,
+                ))
+                video_id = params["requestURL"].rstrip("/").rsplit("/", 1)[-1]
+                data, iv = encrypt_response_payload(build_video_result(video_id, stub.entries))
+                self._send_json({"status": 0, "encrypt": True, "data": data, "iv": iv})
+
+        return Handler
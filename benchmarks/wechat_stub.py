@@ -0,0 +1,104 @@
+"""
+本地的微信文章与图片 CDN 替身。
+
+`/s/<文章ID>` 返回包含 N 张图片的 mp.weixin 风格页面（带 ETag），
+`/img/<文章ID>/<序号>` 在指定延迟后返回指定大小的图片数据，
+同一文章、同一序号的图片内容固定。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class WeChatStubServer:
+    """可配置图片数量、大小和延迟的文章服务器。"""
+
+    def __init__(self, images: int = 20, image_size: int = 200 * 1024, latency: float = 0.05):
+        self.images = images
+        self.image_size = image_size
+        self.latency = latency
+        self.counts = {"article": 0, "image": 0, "bytes": 0}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def article_url(self, article_id: str) -> str:
+        return f"{self.base_url}/s/{article_id}"
+
+    def start(self) -> "WeChatStubServer":
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def render_article(self, article_id: str) -> bytes:
+        images = "".join(
+            f'<p><img class="rich_pages wxw-img" data-ratio="0.75" data-w="1080" '
+            f'data-src="{self.base_url}/img/{article_id}/{i}?wx_fmt=jpeg" src="data:image/svg+xml,%3Csvg%3E"></p>'
+            f'<section><p>第 {i} 段正文。</p></section>'
+            for i in range(self.images)
+        )
+        return (
+            f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{article_id}</title></head>'
+            f'<body><div id="js_article"><div id="js_content">{images}</div></div></body></html>'
+        ).encode("utf-8")
+
+    def render_image(self, article_id: str, index: str) -> bytes:
+        seed = hashlib.sha256(f"{article_id}/{index}".encode()).digest()
+        return (seed * (self.image_size // len(seed) + 1))[: self.image_size]
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, body: bytes, content_type: str, etag: str | None = None) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                if etag:
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                parts = path.strip("/").split("/")
+                if len(parts) == 2 and parts[0] == "s":
+                    etag = f'"{parts[1]}-{stub.images}"'
+                    with stub._lock:
+                        stub.counts["article"] += 1
+                    if self.headers.get("If-None-Match") == etag:
+                        self.send_response(304)
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    self._send(stub.render_article(parts[1]), "text/html; charset=utf-8", etag)
+                    return
+                if len(parts) == 3 and parts[0] == "img":
+                    if stub.latency:
+                        time.sleep(stub.latency)
+                    body = stub.render_image(parts[1], parts[2])
+                    with stub._lock:
+                        stub.counts["image"] += 1
+                        stub.counts["bytes"] += len(body)
+                    self._send(body, "image/jpeg")
+                    return
+                self.send_error(404)
+
+        return Handler
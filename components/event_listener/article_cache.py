@@ -0,0 +1,102 @@
+"""
+微信文章图片清单缓存。
+
+以规范化后的文章链接为键，缓存从页面中提取出的图片列表。缓存在 TTL
+内直接命中；过期后如果服务端提供了 ETag / Last-Modified，则发送条件请求，
+收到 304 时沿用原来的清单，无需重新下载和解析页面。
+"""
+
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+if TYPE_CHECKING:
+    from .article_extractor import ArticleImage
+
+# 文章链接中真正标识文章的参数，其余（scene、chksm、from 等）只是分享来源
+ARTICLE_QUERY_KEYS = ("__biz", "mid", "idx", "sn")
+
+
+def normalize_article_url(url: str) -> str:
+    """去掉分享来源等无关参数，使同一篇文章的不同分享链接得到相同的键。"""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    path = parts.path.rstrip("/") or "/"
+    if host == "mp.weixin.qq.com":
+        query = dict(parse_qsl(parts.query))
+        kept = [(key, query[key]) for key in ARTICLE_QUERY_KEYS if key in query]
+        return urlunsplit(("https", host, path, urlencode(kept), ""))
+    return urlunsplit((parts.scheme.lower(), host, path, parts.query, ""))
+
+
+@dataclass
+class ArticleEntry:
+    images: list[ArticleImage]
+    expires_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @property
+    def fresh(self) -> bool:
+        return time.monotonic() < self.expires_at
+
+    def validators(self) -> dict[str, str]:
+        """条件请求需要携带的请求头。"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ArticleCache:
+    """带 TTL 和容量上限的 LRU 缓存。"""
+
+    def __init__(self, ttl: float = 600, max_entries: int = 256):
+        self.ttl = float(ttl)
+        self.max_entries = max(1, int(max_entries))
+        self._entries: OrderedDict[str, ArticleEntry] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[ArticleEntry]:
+        """返回缓存项（可能已过期，由调用方决定是否重新验证）。"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(
+        self,
+        key: str,
+        images: list[ArticleImage],
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> ArticleEntry:
+        entry = ArticleEntry(
+            images=list(images),
+            expires_at=time.monotonic() + self.ttl,
+            etag=etag,
+            last_modified=last_modified,
+        )
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def refresh(self, key: str) -> Optional[ArticleEntry]:
+        """服务端确认内容未变化（304）后延长缓存有效期。"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry.expires_at = time.monotonic() + self.ttl
+        return entry
+
+    def clear(self) -> None:
+        self._entries.clear()
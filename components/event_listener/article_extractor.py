@@ -0,0 +1,117 @@
+"""
+微信文章图片链接提取。
+
+只需要 `<img>` 的 `data-src` / `src` 属性，因此不构建完整的文档树，而是用
+lxml 的事件式（target）解析器在扫描过程中直接收集图片链接。lxml 不可用时
+回退到原来的 BeautifulSoup 实现，两者返回的结果一致。
+
+正文图片上的 `data-w` / `data-ratio`（或 `width` / `height`）属性会一并记录，
+供下载前的过滤使用。
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Optional, Union
+
+try:
+    from lxml import etree
+except ImportError:  # pragma: no cover - lxml 在 requirements.txt 中，缺失时仅回退
+    etree = None
+
+
+@dataclass(frozen=True)
+class ArticleImage:
+    """文章中的一张图片及页面上标注的尺寸（未标注时为 None）。"""
+
+    url: str
+    width: Optional[int] = None
+    height: Optional[int] = None
+
+
+def _pick_url(attrs) -> str | None:
+    img_url = attrs.get('data-src') or attrs.get('src')
+    if img_url and 'http' in img_url:
+        return img_url
+    return None
+
+
+def _int_attr(attrs, name: str) -> Optional[int]:
+    value = str(attrs.get(name) or '').strip().lower().removesuffix('px')
+    try:
+        number = int(float(value))
+    except ValueError:
+        return None
+    return number if number > 0 else None
+
+
+def _to_image(attrs) -> Optional[ArticleImage]:
+    img_url = _pick_url(attrs)
+    if not img_url:
+        return None
+    width = _int_attr(attrs, 'data-w') or _int_attr(attrs, 'width')
+    height = _int_attr(attrs, 'height')
+    if height is None and width is not None:
+        try:
+            ratio = float(attrs.get('data-ratio') or 0)
+        except ValueError:
+            ratio = 0
+        if ratio > 0:
+            height = max(1, round(width * ratio))
+    return ArticleImage(img_url, width, height)
+
+
+class _ImageCollector:
+    """lxml 解析事件的接收者，只处理 img 起始标签。"""
+
+    def __init__(self):
+        self.images: list[ArticleImage] = []
+
+    def start(self, tag, attrib):
+        if tag == 'img':
+            image = _to_image(attrib)
+            if image:
+                self.images.append(image)
+
+    def end(self, tag):
+        pass
+
+    def data(self, data):
+        pass
+
+    def close(self) -> list[ArticleImage]:
+        return self.images
+
+
+def extract_images_bs4(html: Union[str, bytes]) -> list[ArticleImage]:
+    """原来的完整 BeautifulSoup 解析，作为回退实现和对照基准。"""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    images = []
+    for img in soup.find_all('img'):
+        image = _to_image(img)
+        if image:
+            images.append(image)
+    return images
+
+
+def extract_images(html: Union[str, bytes]) -> list[ArticleImage]:
+    """按文档顺序返回页面中所有 http 图片及其标注尺寸。"""
+    if etree is None or not html:
+        return extract_images_bs4(html)
+    parser = etree.HTMLParser(target=_ImageCollector(), recover=True)
+    try:
+        parser.feed(html)
+        return parser.close()
+    except etree.LxmlError:
+        return extract_images_bs4(html)
+
+
+def extract_image_urls_bs4(html: Union[str, bytes]) -> list[str]:
+    return [image.url for image in extract_images_bs4(html)]
+
+
+def extract_image_urls(html: Union[str, bytes]) -> list[str]:
+    """按文档顺序返回页面中所有 http 图片链接。"""
+    return [image.url for image in extract_images(html)]
@@ -7,27 +7,35 @@ from langbot_plugin.api.entities.builtin.provider import message as provider_mes
 
 import os
 import re
-import requests
-from bs4 import BeautifulSoup
 import asyncio
 import hashlib
 import base64
 import logging
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-from typing import Optional
+import sys
+import time
+from typing import TYPE_CHECKING, Optional
 
 logger = logging.getLogger(__name__)
 
 # 添加项目根目录到Python路径
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
-if project_root not in os.path.sys.path:
-    os.path.sys.path.insert(0, project_root)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
 
-from . import message_processor
-import sys
-sys.path.insert(0, project_root)
-from douyin_parser import parse_video_url, extract_url
+# 导入插件时只加载轻量模块。requests、aiohttp、lxml、cryptography 等重量级
+# 依赖（图片下载、文章解析、抖音解析、视频下载）在 initialize 返回后由后台
+# 线程预热，见 _load_components
+from .article_cache import ArticleCache, ArticleEntry, normalize_article_url
+from . import image_filter
+from .message_processor import IMAGE_CACHE as ENCODED_IMAGE_CACHE, MessageProcessor
+from .send_scheduler import SendScheduler
+from .single_flight import SingleFlight
+from .job_queue import Job, JobQueue, QueueFull
+from loop_monitor import MONITOR as LOOP_MONITOR, run_command
+from stage_metrics import METRICS
+
+if TYPE_CHECKING:
+    from .article_extractor import ArticleImage
 
 
 class DefaultEventListener(EventListener):
@@ -35,21 +43,60 @@ class DefaultEventListener(EventListener):
     async def initialize(self):
         await super().initialize()
 
-        # 配置请求会话
+        config = self.get_plugin_config()
+        self.config = config
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
         }
-        self.session = requests.Session()
-        retry_strategy = Retry(
-            total=3,
-            backoff_factor=1,
-            status_forcelist=[500, 502, 503, 504]
+        self.timeout = (
+            config.get("http_connect_timeout", 5),
+            config.get("http_read_timeout", 10),
+        )
+
+        # 文章图片清单缓存
+        self.article_cache = ArticleCache(
+            ttl=config.get("article_cache_ttl", 600),
+            max_entries=config.get("article_cache_size", 256),
+        )
+
+        # 本地图片的 base64 编码缓存容量和单张图片上限
+        ENCODED_IMAGE_CACHE.configure(
+            max_bytes=config.get("local_image_cache_mb", 32) * 1024 * 1024,
+            max_image_bytes=config.get("local_image_max_mb", 10) * 1024 * 1024,
+        )
+
+        # 宽或高小于该值的图片视为图标，不下载也不发送，0 表示只按链接过滤
+        self.min_dimension = config.get("image_min_dimension", image_filter.MIN_DIMENSION)
+
+        # 合并相同链接的并发请求，多个会话共享同一次上游请求
+        self.flights = SingleFlight()
+
+        # 发送限速：每个会话一个令牌桶，另有全局令牌桶
+        self.send_scheduler = SendScheduler(
+            rate=config.get("send_rate", 1.0),
+            burst=config.get("send_burst", 3),
+            global_rate=config.get("send_rate_global", 5.0),
+            global_burst=config.get("send_burst_global", 10),
         )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        self.session.mount("http://", adapter)
-        self.session.mount("https://", adapter)
-        self.session.headers.update(self.headers)
-        self.timeout = (5, 10)
+
+        # 后台任务队列：固定数量的 worker 执行 /img、/dy，限制每个用户和会话的并发
+        self.jobs = JobQueue(
+            workers=config.get("job_workers", 4),
+            max_queue=config.get("job_queue_size", 50),
+            per_user=config.get("job_per_user", 1),
+            per_target=config.get("job_per_conversation", 2),
+        )
+
+        # 事件循环阻塞检测，可以用 /loop on|off 在运行时开关
+        LOOP_MONITOR.configure(threshold=config.get("loop_stall_ms", 200) / 1000)
+        if config.get("loop_monitor", False):
+            LOOP_MONITOR.start()
+
+        # 下载、解析组件在后台线程中创建，不阻塞插件加载；关闭预热时在第一条
+        # /img、/dy 命令到达时创建
+        self._ready: Optional[asyncio.Future] = None
+        if config.get("warm_up", True):
+            self._start_loading()
 
         # 分别处理私聊和群聊消息
         @self.handler(events.PersonMessageReceived)
@@ -60,10 +107,184 @@ class DefaultEventListener(EventListener):
         async def handle_group_message(event_context: context.EventContext):
             await self.process_message(event_context, is_private=False)
 
+    def _start_loading(self) -> asyncio.Future:
+        self._ready = asyncio.get_running_loop().run_in_executor(None, self._load_components)
+        self._ready.add_done_callback(self._loading_done)
+        return self._ready
+
+    def _loading_done(self, future: asyncio.Future) -> None:
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(f"组件加载失败：{str(future.exception())}")
+
+    async def ready(self):
+        """等待下载、解析组件加载完成，上一次加载失败时重新加载"""
+        future = self._ready
+        if future is None or (future.done() and (future.cancelled() or future.exception() is not None)):
+            future = self._start_loading()
+        # 调用方被取消时不影响其他命令等待同一次加载
+        await asyncio.shield(future)
+
+    async def _ensure_ready(self, event_context: context.EventContext) -> bool:
+        """命令执行前等待组件加载完成，加载失败时回复用户"""
+        try:
+            await self.ready()
+        except Exception as e:
+            await event_context.reply(
+                platform_message.MessageChain([
+                    platform_message.Plain(text=f"插件组件加载失败：{str(e)}")
+                ])
+            )
+            return False
+        return True
+
+    def _load_components(self):
+        """在线程中导入重量级依赖，创建 HTTP 会话、图片缓存、下载器和抖音解析配置"""
+        started = time.perf_counter()
+        config = self.config
+
+        import http_transport
+        import douyin_parser
+        from . import article_extractor  # noqa: F401  预先加载 lxml
+        from .image_downloader import ImageDownloader
+        from .image_store import ImageStore
+
+        # 配置请求会话，与抖音解析共用同一个连接池
+        self.transport = http_transport.configure(
+            pool_maxsize=config.get("http_pool_size", http_transport.DEFAULT_POOL_MAXSIZE),
+            timeout=self.timeout,
+            max_retries=3,
+            backoff_factor=1,
+            dns_ttl=config.get("dns_cache_ttl", http_transport.DEFAULT_DNS_TTL),
+        )
+        self.session = self.transport.session("wechat", self.headers)
+
+        # 按 MD5 保存的本地图片缓存
+        self.store = ImageStore(
+            root=config.get("image_store_dir", "wechat_images"),
+            max_bytes=config.get("image_store_max_mb", 512) * 1024 * 1024,
+            max_age=config.get("image_store_max_age_days", 7) * 24 * 3600,
+        )
+
+        # 发送前缩小并重新压缩大图（需要 Pillow）
+        self.transcoder = None
+        if config.get("image_transcode", False):
+            from . import image_transcoder
+
+            if image_transcoder.available():
+                self.transcoder = image_transcoder.ImageTranscoder(
+                    self.store,
+                    max_dimension=config.get("image_max_dimension", image_transcoder.DEFAULT_MAX_DIMENSION),
+                    fmt=config.get("image_transcode_format", "JPEG"),
+                    quality=config.get("image_transcode_quality", image_transcoder.DEFAULT_QUALITY),
+                    min_bytes=config.get("image_transcode_min_kb", 256) * 1024,
+                    workers=config.get("image_transcode_workers", 0),
+                )
+            else:
+                logger.warning("未安装 Pillow，图片转码未开启：pip install Pillow")
+
+        # 图片下载引擎
+        self.downloader = ImageDownloader(
+            self.session,
+            timeout=self.timeout,
+            max_concurrency=config.get("download_concurrency", 8),
+            per_host_concurrency=config.get("download_concurrency_per_host", 4),
+            store=self.store,
+            max_bytes=config.get("image_max_mb", 20) * 1024 * 1024,
+            min_dimension=self.min_dimension,
+            transcoder=self.transcoder,
+        )
+
+        # 抖音解析结果按视频 ID 缓存，有效期需短于视频链接的过期时间
+        douyin_parser.RESULT_CACHE.configure(
+            ttl=config.get("douyin_cache_ttl", 600),
+            max_entries=config.get("douyin_cache_size", 512),
+        )
+
+        # 解析接口的对冲请求与熔断
+        douyin_parser.configure_resilience(
+            hedge=config.get("douyin_hedge", True),
+            failure_threshold=config.get("douyin_breaker_failures", 5),
+            reset_timeout=config.get("douyin_breaker_reset", 30),
+        )
+
+        # /dy 解析后下载视频文件（默认只回复链接）
+        self.video_downloader = None
+        if config.get("video_download", False):
+            from .video_downloader import VideoDownloader
+
+            self.video_downloader = VideoDownloader(
+                root=config.get("video_dir", "douyin_videos"),
+                segments=config.get("video_download_segments", 4),
+                max_bytes=config.get("video_max_mb", 200) * 1024 * 1024,
+                headers=self.headers,
+            )
+
+        METRICS.observe("plugin.load", time.perf_counter() - started)
+        logger.info(f"组件加载完成，耗时 {(time.perf_counter() - started) * 1000:.0f} ms")
+
     def calculate_md5(self, data):
         """计算数据的MD5值"""
         return hashlib.md5(data).hexdigest()
 
+    async def fetch_article_images(self, url: str) -> list[ArticleImage]:
+        """获取文章中的图片，优先使用缓存，过期后按 ETag/Last-Modified 重新验证"""
+        key = normalize_article_url(url)
+        entry = self.article_cache.get(key)
+        METRICS.cache("article", hit=entry is not None and entry.fresh)
+        if entry is not None and entry.fresh:
+            return entry.images
+        return await self.flights.do(("article", key), lambda: self._fetch_article_images(url, key, entry))
+
+    async def _fetch_article_images(self, url: str, key: str, entry: Optional[ArticleEntry]) -> list[ArticleImage]:
+        from .article_extractor import extract_images
+
+        headers = entry.validators() if entry is not None else {}
+
+        def fetch():
+            with METRICS.timer("img.article_fetch"):
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304:
+                return response, None
+            with METRICS.timer("img.article_parse"):
+                return response, extract_images(response.text)
+
+        loop = asyncio.get_running_loop()
+        response, images = await loop.run_in_executor(None, fetch)
+        if response.status_code == 304 and entry is not None:
+            METRICS.incr("article.revalidated")
+            self.article_cache.refresh(key)
+            return entry.images
+        images = images or []
+
+        if response.status_code == 200:
+            self.article_cache.put(
+                key,
+                images,
+                etag=response.headers.get('ETag'),
+                last_modified=response.headers.get('Last-Modified'),
+            )
+        return images
+
+    def filter_images(self, images: list[ArticleImage]) -> tuple[list[str], set[str]]:
+        """去重并丢弃明显无用的图片，返回待下载的链接和需要先探测尺寸的链接"""
+        img_urls = []
+        probe = set()
+        for image in image_filter.dedupe(images):
+            verdict, reason = image_filter.classify(image, self.min_dimension)
+            if verdict is image_filter.Verdict.DROP:
+                logger.info(f"跳过图片 {image.url}：{reason}")
+                continue
+            img_urls.append(image.url)
+            if verdict is image_filter.Verdict.PROBE:
+                probe.add(image.url)
+        METRICS.incr("img.filtered", len(images) - len(img_urls))
+        return img_urls, probe
+
+    async def _reply_text(self, event_context: context.EventContext, sender_id: str, text: str):
+        """回复文本，其中的图片标记转换为图片，本地大图在线程池中编码"""
+        parts = await MessageProcessor.convert_message_async(text, sender_id)
+        await event_context.reply(platform_message.MessageChain(parts))
+
     async def process_message(self, event_context: context.EventContext, is_private: bool):
         """处理消息的通用函数"""
         # 获取消息内容
@@ -80,25 +301,76 @@ class DefaultEventListener(EventListener):
         # /img 命令
         if msg.startswith("/img"):
             event_context.prevent_default()
-            await self.handle_img_command(event_context, target_id, msg)
+            await self.submit_job(
+                event_context, sender_id, target_id, "/img",
+                lambda: self.handle_img_command(event_context, target_id, msg),
+            )
             return
 
         # /dy 命令 - 抖音视频解析
         if msg.startswith("/dy"):
             event_context.prevent_default()
-            await self.handle_douyin_command(event_context, target_id, msg)
+            await self.submit_job(
+                event_context, sender_id, target_id, "/dy",
+                lambda: self.handle_douyin_command(event_context, target_id, msg),
+            )
+            return
+
+        # /cancel 命令 - 取消自己在当前会话中的任务
+        if msg.startswith("/cancel"):
+            event_context.prevent_default()
+            cancelled = self.jobs.cancel(sender_id, target_id)
+            text = f"已取消 {cancelled} 个任务" if cancelled else "当前没有可以取消的任务"
+            await self._reply_text(event_context, sender_id, text)
+            return
+
+        # /stats 命令 - 各阶段耗时统计，/stats json 返回完整 JSON
+        if msg.startswith("/stats"):
+            event_context.prevent_default()
+            text = METRICS.to_json() if "json" in msg[len("/stats"):] else METRICS.summary()
+            await self._reply_text(event_context, sender_id, text)
+            return
+
+        # /loop 命令 - 事件循环阻塞检测的状态和最近的阻塞，/loop on|off 开关
+        if msg.startswith("/loop"):
+            event_context.prevent_default()
+            arg = msg[len("/loop"):].strip().lower()
+            if arg == "on":
+                LOOP_MONITOR.start()
+            elif arg == "off":
+                LOOP_MONITOR.stop()
+            await self._reply_text(event_context, sender_id, LOOP_MONITOR.summary())
             return
 
         # /id 命令
         if msg.startswith("/id"):
             event_context.prevent_default()
+            await self._reply_text(event_context, sender_id, f"你的ID是: {sender_id}")
+            return
+
+    async def submit_job(self, event_context: context.EventContext, sender_id: str, target_id: str, name: str, run):
+        """把耗时命令提交到后台任务队列，排队时告知当前位置"""
+        try:
+            # 以命令名执行，事件循环阻塞检测据此归因
+            position = self.jobs.submit(Job(
+                user_id=sender_id, target_id=target_id, name=name,
+                run=lambda: run_command(name, run),
+            ))
+        except QueueFull:
             await event_context.reply(
                 platform_message.MessageChain([
-                    platform_message.Plain(text=f"你的ID是: {sender_id}")
+                    platform_message.Plain(text="当前任务较多，请稍后再试")
                 ])
             )
             return
 
+        if position:
+            await event_context.reply(
+                platform_message.MessageChain([
+                    platform_message.Plain(text=f"任务已加入队列，当前排在第 {position} 位，发送 /cancel 可取消")
+                ])
+            )
+
     async def handle_img_command(self, event_context: context.EventContext, target_id: str, msg: str):
         """处理图片命令的通用函数"""
         # 提取URL
@@ -112,86 +384,143 @@ class DefaultEventListener(EventListener):
             return
 
         url = url_match.group(1)
-        
-        try:
-            response = requests.get(url, headers=self.headers)
-            soup = BeautifulSoup(response.text, 'html.parser')
-            img_tags = soup.find_all('img')
-            
-            if not img_tags:
-                await event_context.reply(
-                    platform_message.MessageChain([
-                        platform_message.Plain(text="未找到图片")
-                    ])
-                )
-                return
+        if not await self._ensure_ready(event_context):
+            return
 
-            # 发送开始下载的消息
-            await event_context.reply(
-                platform_message.MessageChain([
-                    platform_message.Plain(text=f"找到 {len(img_tags)} 张图片，开始处理...")
-                ])
-            )
-            
-            # 下载图片并一张一张发送
-            success_count = 0
-            for idx, img in enumerate(img_tags):
-                img_url = img.get('data-src') or img.get('src')
-                if img_url and 'http' in img_url:
-                    try:
-                        # 下载图片
-                        img_response = requests.get(img_url, headers=self.headers)
-                        if img_response.status_code == 200:
-                            img_data = img_response.content
-                            
-                            # 计算MD5
-                            emoji_md5 = self.calculate_md5(img_data)
-                            
-                            # 发送表情（使用MD5）
-                            await event_context.reply(
-                                platform_message.MessageChain([
-                                    platform_message.WeChatEmoji(
-                                        emoji_md5=emoji_md5,
-                                        emoji_size=0
-                                    )
-                                ])
-                            )
-                            
-                            success_count += 1
-                            
-                            # 等待2秒
-                            await asyncio.sleep(2)
-                        else:
-                            logger.error(f"下载图片失败，状态码：{img_response.status_code}")
-                    except Exception as e:
-                        logger.error(f"处理第 {idx+1} 张图片失败：{str(e)}")
-            
-            # 发送完成消息
+        try:
+            with METRICS.timer("img.total"):
+                await self._process_article(event_context, target_id, url)
+        except Exception as e:
+            METRICS.incr("img.failed")
+            logger.error(f"处理失败：{str(e)}")
             await event_context.reply(
                 platform_message.MessageChain([
-                    platform_message.Plain(text=f"处理完成，成功发送 {success_count} 张图片")
+                    platform_message.Plain(text=f"处理失败：{str(e)}")
                 ])
             )
-            
-        except Exception as e:
-            logger.error(f"处理失败：{str(e)}")
+
+    async def _process_article(self, event_context: context.EventContext, target_id: str, url: str):
+        """下载文章图片并按顺序发送"""
+        images = await self.fetch_article_images(url)
+        img_urls, probe = self.filter_images(images)
+        
+        if not img_urls:
             await event_context.reply(
                 platform_message.MessageChain([
-                    platform_message.Plain(text=f"处理失败：{str(e)}")
+                    platform_message.Plain(text="未找到图片")
                 ])
             )
+            return
+
+        # 发送开始下载的消息
+        await event_context.reply(
+            platform_message.MessageChain([
+                platform_message.Plain(text=f"找到 {len(img_urls)} 张图片，开始处理...")
+            ])
+        )
+        
+        # 并发下载，按文章顺序一张一张限速发送
+        success_count = 0
+        saved_bytes = 0
+        sent_md5 = set()
+        async for result in self.downloader.iter_downloads(img_urls, probe):
+            if result.skipped:
+                logger.info(f"跳过第 {result.index+1} 张图片：{result.skipped}")
+                continue
+            if result.error:
+                METRICS.incr("img.skipped")
+                logger.error(f"处理第 {result.index+1} 张图片失败：{result.error}")
+                continue
+            if result.status_code != 200:
+                METRICS.incr("img.skipped")
+                logger.error(f"下载图片失败，状态码：{result.status_code}")
+                continue
+            # 内容相同的图片（链接不同）只发送一次
+            if result.md5 in sent_md5:
+                METRICS.incr("img.duplicate")
+                continue
+            sent_md5.add(result.md5)
+
+            try:
+                # MD5 在流式下载时已增量计算，转码后的图片使用转码结果的 MD5
+                emoji_md5 = result.md5
+                
+                # 按会话限速发送表情（使用MD5）
+                await self.send_scheduler.send(
+                    target_id,
+                    lambda: event_context.reply(
+                        platform_message.MessageChain([
+                            platform_message.WeChatEmoji(
+                                emoji_md5=emoji_md5,
+                                emoji_size=0
+                            )
+                        ])
+                    ),
+                )
+                
+                success_count += 1
+                saved_bytes += result.saved
+                METRICS.incr("img.sent")
+            except Exception as e:
+                logger.error(f"处理第 {result.index+1} 张图片失败：{str(e)}")
+        
+        if saved_bytes:
+            logger.info(f"图片转码共节省 {saved_bytes} 字节")
+
+        # 发送完成消息
+        await event_context.reply(
+            platform_message.MessageChain([
+                platform_message.Plain(text=f"处理完成，成功发送 {success_count} 张图片")
+            ])
+        )
+
+    def pick_best_video_url(self, result: dict) -> Optional[str]:
+        """从解析结果中提取最清晰的视频链接"""
+        best_video_url = None
+        
+        # 尝试从 videos 数组中提取
+        if 'videos' in result and len(result['videos']) > 0:
+            video_data = result['videos'][0]
+            if 'video_fullinfo' in video_data and len(video_data['video_fullinfo']) > 0:
+                videos = video_data['video_fullinfo']
+                # 按类型优先级选择：超高清 > 720p > 540p
+                best_video = max(
+                    videos,
+                    key=lambda v: (
+                        int(v.get('size') or 0),
+                        str(v.get('type') or '')
+                    )
+                )
+                best_video_url = best_video.get('url')
+                logger.info(f"提取到视频链接: {best_video_url}")
+        
+        # 如果没有找到 video_fullinfo，使用默认 url
+        if not best_video_url and 'url' in result:
+            best_video_url = result['url']
+            logger.info(f"使用默认URL: {best_video_url}")
+        
+        return best_video_url
 
     async def handle_douyin_command(self, event_context: context.EventContext, target_id: str, msg: str):
-        """处理抖音视频解析命令"""
+        """处理抖音视频解析命令，支持一条消息中包含多个链接"""
+        if not await self._ensure_ready(event_context):
+            return
+        from douyin_parser import extract_urls, normalize_video_url, parse_video_url_async
+
         # 提取URL
-        dy_url = extract_url(msg)
-        if not dy_url:
+        dy_urls = extract_urls(msg)
+        if not dy_urls:
             await event_context.reply(
                 platform_message.MessageChain([
                     platform_message.Plain(text="请提供有效的抖音链接，格式：/dy 链接")
                 ])
             )
             return
+
+        if len(dy_urls) > 1:
+            await self.handle_douyin_batch(event_context, dy_urls)
+            return
+        dy_url = dy_urls[0]
         
         try:
             await event_context.reply(
@@ -200,34 +529,18 @@ class DefaultEventListener(EventListener):
                 ])
             )
             
-            # 解析抖音视频
-            result = parse_video_url(dy_url)
+            # 解析抖音视频（非阻塞），相同链接的并发请求共享一次解析
+            with METRICS.timer("dy.total"):
+                result = await self.flights.do(
+                    ("douyin", normalize_video_url(dy_url)),
+                    lambda: parse_video_url_async(dy_url),
+                )
+            METRICS.incr("dy.ok")
             logger.info(f"解析结果: {result}")
             
             if 'title' in result:
                 # 提取最清晰的视频链接
-                best_video_url = None
-                
-                # 尝试从 videos 数组中提取
-                if 'videos' in result and len(result['videos']) > 0:
-                    video_data = result['videos'][0]
-                    if 'video_fullinfo' in video_data and len(video_data['video_fullinfo']) > 0:
-                        videos = video_data['video_fullinfo']
-                        # 按类型优先级选择：超高清 > 720p > 540p
-                        best_video = max(
-                            videos,
-                            key=lambda v: (
-                                int(v.get('size') or 0),
-                                str(v.get('type') or '')
-                            )
-                        )
-                        best_video_url = best_video.get('url')
-                        logger.info(f"提取到视频链接: {best_video_url}")
-                
-                # 如果没有找到 video_fullinfo，使用默认 url
-                if not best_video_url and 'url' in result:
-                    best_video_url = result['url']
-                    logger.info(f"使用默认URL: {best_video_url}")
+                best_video_url = self.pick_best_video_url(result)
                 
                 # 构建回复消息
                 response_parts = []
@@ -240,6 +553,8 @@ class DefaultEventListener(EventListener):
                 await event_context.reply(
                     platform_message.MessageChain(response_parts)
                 )
+                if best_video_url and self.video_downloader is not None:
+                    await self.send_video_file(event_context, best_video_url, result.get('title'))
             else:
                 await event_context.reply(
                     platform_message.MessageChain([
@@ -248,9 +563,82 @@ class DefaultEventListener(EventListener):
                 )
                 
         except Exception as e:
+            METRICS.incr("dy.failed")
             logger.error(f"抖音解析失败：{str(e)}")
             await event_context.reply(
                 platform_message.MessageChain([
                     platform_message.Plain(text=f"解析失败：{str(e)}")
                 ])
             )
+
+    async def send_video_file(self, event_context: context.EventContext, video_url: str, title: Optional[str]):
+        """分段并行下载视频，并以文件形式发送"""
+        try:
+            video = await self.flights.do(
+                ("video", video_url),
+                lambda: self.video_downloader.download(video_url),
+            )
+        except Exception as e:
+            logger.error(f"视频下载失败：{str(e)}")
+            await event_context.reply(
+                platform_message.MessageChain([
+                    platform_message.Plain(text=f"视频下载失败：{str(e)}")
+                ])
+            )
+            return
+
+        if not video.cached:
+            logger.info(
+                f"视频下载完成：{video.size} 字节，{video.segments} 段，耗时 {video.elapsed:.1f} 秒"
+            )
+        name = re.sub(r'[\\/:*?"<>|\s]+', '_', title or '').strip('_')[:50] or 'douyin'
+        await event_context.reply(
+            platform_message.MessageChain([
+                platform_message.File(name=f"{name}.mp4", size=video.size, path=os.path.abspath(video.path))
+            ])
+        )
+
+    async def handle_douyin_batch(self, event_context: context.EventContext, dy_urls: list[str]):
+        """批量解析多个抖音链接，所有结果合并为一条回复"""
+        from douyin_parser import normalize_video_url, parse_video_urls_async
+
+        await event_context.reply(
+            platform_message.MessageChain([
+                platform_message.Plain(text=f"正在解析 {len(dy_urls)} 个抖音视频，请稍候...")
+            ])
+        )
+
+        try:
+            with METRICS.timer("dy.batch_total"):
+                results = await self.flights.do(
+                    ("douyin-batch", tuple(normalize_video_url(u) for u in dy_urls)),
+                    lambda: parse_video_urls_async(dy_urls),
+                )
+        except Exception as e:
+            METRICS.incr("dy.failed", len(dy_urls))
+            logger.error(f"抖音批量解析失败：{str(e)}")
+            await event_context.reply(
+                platform_message.MessageChain([
+                    platform_message.Plain(text=f"解析失败：{str(e)}")
+                ])
+            )
+            return
+
+        lines = [f"🔗 共 {len(results)} 个视频的最清晰链接："]
+        for idx, item in enumerate(results, start=1):
+            METRICS.incr("dy.ok" if item.ok else "dy.failed")
+            if not item.ok:
+                logger.error(f"抖音解析失败：{item.url} {item.error}")
+                lines.append(f"{idx}. 解析失败：{item.error}")
+                continue
+            best_video_url = self.pick_best_video_url(item.result) if 'title' in item.result else None
+            if best_video_url:
+                lines.append(f"{idx}. {item.result.get('title', '')}\n{best_video_url}")
+            else:
+                lines.append(f"{idx}. 未能提取到视频链接")
+
+        await event_context.reply(
+            platform_message.MessageChain([
+                platform_message.Plain(text="\n".join(lines))
+            ])
+        )
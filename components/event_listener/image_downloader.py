@@ -0,0 +1,287 @@
+"""
+文章图片并发下载引擎。
+
+按全局和单 host 两级并发上限并行下载图片，下载本身在线程池中执行，
+不会阻塞事件循环；结果按文章中的顺序依次产出，第一张图片就绪即可开始发送，
+不必等待全部下载完成。配置了 ImageStore 时，命中本地缓存的图片不会产生
+任何网络请求。
+
+图片以分块流式下载，MD5 随数据到达增量计算，数据块直接写入缓存目录，
+每张图片在内存中只保留一个数据块；超过大小上限的图片会被提前中止。
+
+需要探测尺寸的图片先用 Range 请求读取开头几 KB，尺寸过小的图片不再完整下载。
+配置了 ImageTranscoder 时，下载完成的图片在预取窗口内并行转码，不占用网络并发名额。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import dataclasses
+import hashlib
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, AsyncIterator, Collection, Optional
+from urllib.parse import urlsplit
+
+from stage_metrics import METRICS, inherit_labels
+
+from .image_filter import PROBE_BYTES, parse_dimensions, too_small
+from .single_flight import SingleFlight
+
+if TYPE_CHECKING:
+    import requests
+
+    from .image_store import ImageStore
+    from .image_transcoder import ImageTranscoder
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class DownloadResult:
+    """单张图片的下载结果。"""
+
+    index: int
+    url: str
+    status_code: Optional[int] = None
+    error: Optional[str] = None
+    md5: Optional[str] = None
+    size: int = 0
+    # 图片在本地缓存中的路径，未配置缓存时为 None
+    path: Optional[str] = None
+    cached: bool = False
+    # 被尺寸过滤跳过时的原因
+    skipped: Optional[str] = None
+    # 转码节省的字节数，md5、size、path 均为转码后的内容
+    saved: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return (
+            self.error is None and self.skipped is None
+            and self.status_code == 200 and self.md5 is not None
+        )
+
+
+class ImageTooLarge(Exception):
+    """图片超过大小上限。"""
+
+
+class ImageDownloader:
+    """有界并发的图片下载器。"""
+
+    def __init__(
+        self,
+        session: requests.Session,
+        timeout=None,
+        max_concurrency: int = 8,
+        per_host_concurrency: int = 4,
+        max_ahead: Optional[int] = None,
+        store: Optional[ImageStore] = None,
+        max_bytes: int = 20 * 1024 * 1024,
+        chunk_size: int = 64 * 1024,
+        min_dimension: int = 0,
+        probe_bytes: int = PROBE_BYTES,
+        transcoder: Optional[ImageTranscoder] = None,
+    ):
+        self.session = session
+        self.store = store
+        self.transcoder = transcoder
+        # 宽或高小于该值的图片被跳过，0 表示不检查尺寸
+        self.min_dimension = int(min_dimension)
+        self.probe_bytes = max(64, int(probe_bytes))
+        self.max_bytes = int(max_bytes)
+        self.chunk_size = int(chunk_size)
+        self.timeout = timeout
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.per_host_concurrency = max(1, int(per_host_concurrency))
+        # 已下载但尚未被消费的图片数量上限，避免发送慢时结果在内存中堆积
+        self.max_ahead = max(self.max_concurrency, int(max_ahead or self.max_concurrency * 2))
+        self._global_limit: Optional[asyncio.Semaphore] = None
+        self.flights = SingleFlight()
+        self._host_limits: dict[str, asyncio.Semaphore] = {}
+
+    def _limits_for(self, url: str) -> tuple[asyncio.Semaphore, asyncio.Semaphore]:
+        # 信号量需要在事件循环内创建，且在多次调用之间共享，才能限制全局并发
+        if self._global_limit is None:
+            self._global_limit = asyncio.Semaphore(self.max_concurrency)
+        host = urlsplit(url).netloc.lower()
+        host_limit = self._host_limits.get(host)
+        if host_limit is None:
+            host_limit = self._host_limits[host] = asyncio.Semaphore(self.per_host_concurrency)
+        return self._global_limit, host_limit
+
+    def _skipped(self, index: int, url: str, dimensions: tuple[int, int]) -> DownloadResult:
+        METRICS.incr("img.too_small")
+        return DownloadResult(
+            index=index, url=url, status_code=200,
+            skipped=f"尺寸 {dimensions[0]}×{dimensions[1]} 小于 {self.min_dimension}",
+        )
+
+    def _lookup(self, index: int, url: str, probe: bool = False) -> Optional[DownloadResult]:
+        digest = self.store.lookup(url)
+        METRICS.cache("image_store", hit=digest is not None)
+        if digest is None:
+            return None
+        path = self.store.path_for(digest)
+        try:
+            size = os.path.getsize(path)
+            if probe and self.min_dimension > 0:
+                with open(path, "rb") as f:
+                    dimensions = parse_dimensions(f.read(self.probe_bytes))
+                if too_small(dimensions, self.min_dimension):
+                    return self._skipped(index, url, dimensions)
+        except OSError:
+            return None
+        return DownloadResult(
+            index=index, url=url, status_code=200, md5=digest, size=size, path=path, cached=True
+        )
+
+    def _probe(self, index: int, url: str) -> Optional[DownloadResult]:
+        """
+        只请求开头 probe_bytes 字节读取图片尺寸。
+
+        尺寸过小时返回跳过结果；图片本身不超过探测长度时直接作为下载结果；
+        其余情况返回 None，由调用方完整下载。
+        """
+        headers = {"Range": f"bytes=0-{self.probe_bytes - 1}"}
+        with self.session.get(url, headers=headers, timeout=self.timeout, stream=True) as response:
+            if response.status_code not in (200, 206):
+                return None
+            data = b""
+            for chunk in response.iter_content(chunk_size=self.probe_bytes):
+                data += chunk
+                if len(data) >= self.probe_bytes:
+                    break
+            if response.status_code == 206:
+                total = response.headers.get("Content-Range", "").rpartition("/")[2]
+            else:
+                total = response.headers.get("Content-Length", "")
+        METRICS.incr("img.probe_bytes", len(data))
+
+        dimensions = parse_dimensions(data)
+        if too_small(dimensions, self.min_dimension):
+            return self._skipped(index, url, dimensions)
+        if not (total.isdigit() and int(total) == len(data)):
+            return None
+
+        digest = hashlib.md5(data).hexdigest()
+        path = None
+        if self.store is not None:
+            try:
+                path = self.store.put(url, data, digest)
+            except Exception as e:
+                logger.error(f"保存图片失败：{e}")
+        return DownloadResult(index=index, url=url, status_code=200, md5=digest, size=len(data), path=path)
+
+    def _fetch(self, index: int, url: str, probe: bool = False) -> DownloadResult:
+        if probe and self.min_dimension > 0:
+            with METRICS.timer("img.probe"):
+                result = self._probe(index, url)
+            if result is not None:
+                return result
+        with METRICS.timer("img.download"):
+            return self._stream(index, url)
+
+    def _stream(self, index: int, url: str) -> DownloadResult:
+        with self.session.get(url, timeout=self.timeout, stream=True) as response:
+            if response.status_code != 200:
+                return DownloadResult(index=index, url=url, status_code=response.status_code)
+
+            content_length = response.headers.get("Content-Length")
+            if self.max_bytes > 0 and content_length and content_length.isdigit():
+                if int(content_length) > self.max_bytes:
+                    raise ImageTooLarge(f"图片大小 {content_length} 字节超过上限 {self.max_bytes} 字节")
+
+            md5 = hashlib.md5()
+            size = 0
+            hash_seconds = 0.0
+            tmp_path = self.store.temp_path() if self.store is not None else None
+            try:
+                with open(tmp_path, "wb") if tmp_path else contextlib.nullcontext() as f:
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        size += len(chunk)
+                        if self.max_bytes > 0 and size > self.max_bytes:
+                            raise ImageTooLarge(f"图片超过大小上限 {self.max_bytes} 字节")
+                        started = time.perf_counter()
+                        md5.update(chunk)
+                        hash_seconds += time.perf_counter() - started
+                        if f is not None:
+                            f.write(chunk)
+            except BaseException:
+                if tmp_path:
+                    with contextlib.suppress(OSError):
+                        os.remove(tmp_path)
+                raise
+
+        digest = md5.hexdigest()
+        METRICS.observe("img.hash", hash_seconds)
+        METRICS.incr("img.downloaded_bytes", size)
+        path = None
+        if tmp_path:
+            try:
+                path = self.store.put_file(url, tmp_path, digest, size)
+            except Exception as e:
+                logger.error(f"保存图片失败：{e}")
+        return DownloadResult(index=index, url=url, status_code=200, md5=digest, size=size, path=path)
+
+    async def download(self, index: int, url: str, probe: bool = False) -> DownloadResult:
+        """
+        在并发上限内下载单张图片，异常会被记录到结果中而不是抛出。
+
+        probe 为 True 时先检查图片尺寸，过小的图片返回 skipped 结果。
+        同一 URL 正在下载时（例如多个会话同时处理同一篇文章）直接共享那次下载。
+        """
+        result = await self.flights.do((url, probe), lambda: self._download(index, url, probe))
+        return result if result.index == index else dataclasses.replace(result, index=index)
+
+    async def _download(self, index: int, url: str, probe: bool = False) -> DownloadResult:
+        result = await self._download_original(index, url, probe)
+        if self.transcoder is not None:
+            result = await self.transcoder.transcode(result)
+        return result
+
+    async def _download_original(self, index: int, url: str, probe: bool = False) -> DownloadResult:
+        loop = asyncio.get_running_loop()
+        if self.store is not None:
+            # 缓存命中不占用网络并发名额
+            try:
+                cached = await loop.run_in_executor(None, self._lookup, index, url, probe)
+            except Exception as e:
+                logger.error(f"读取图片缓存失败：{e}")
+                cached = None
+            if cached is not None:
+                return cached
+
+        global_limit, host_limit = self._limits_for(url)
+        async with host_limit:
+            async with global_limit:
+                try:
+                    return await loop.run_in_executor(None, self._fetch, index, url, probe)
+                except Exception as e:
+                    return DownloadResult(index=index, url=url, error=str(e))
+
+    async def iter_downloads(
+        self, urls: list[str], probe: Optional[Collection[str]] = None
+    ) -> AsyncIterator[DownloadResult]:
+        """并发下载 urls，并按原顺序逐个产出结果；probe 中的链接先检查尺寸。"""
+        probe = probe or ()
+        tasks: list[Optional[asyncio.Task]] = []
+        next_index = 0
+        try:
+            for position in range(len(urls)):
+                # 保持一个有限的预取窗口
+                while next_index < len(urls) and next_index < position + self.max_ahead:
+                    url = urls[next_index]
+                    tasks.append(inherit_labels(asyncio.ensure_future(self.download(next_index, url, url in probe))))
+                    next_index += 1
+                result = await tasks[position]
+                tasks[position] = None
+                yield result
+        finally:
+            for task in tasks:
+                if task is not None and not task.done():
+                    task.cancel()
@@ -0,0 +1,185 @@
+"""
+文章图片的下载前过滤。
+
+文章中除了正文图片，还有重复引用的图片、1×1 统计像素、二维码、头像和
+分隔线等小图标。下载前先按以下规则处理：
+
+- 去掉重复链接（同一张图片的不同尺寸/懒加载参数视为同一张）；
+- 根据链接和页面标注的尺寸直接丢弃明显的无用图片；
+- 无法确定的图片只请求开头几 KB，读出图片头中的宽高后再决定是否完整下载。
+"""
+
+from __future__ import annotations
+
+import re
+import struct
+from enum import Enum
+from typing import TYPE_CHECKING, Iterable, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+if TYPE_CHECKING:
+    from .article_extractor import ArticleImage
+
+# 宽或高小于该值的图片视为图标/像素点
+MIN_DIMENSION = 64
+# 读取图片尺寸时请求的字节数，足以覆盖绝大多数图片头（JPEG 的 EXIF 过大时读不到尺寸，按保留处理）
+PROBE_BYTES = 8 * 1024
+
+# 链接中出现即可判定为非正文图片的片段（二维码、头像、公众号界面图标）
+JUNK_URL_PATTERNS = (
+    "qrcode",
+    "/qr/",
+    "mmbiz.qlogo.cn",
+    "wx.qlogo.cn",
+    "res.wx.qq.com",
+)
+# 可以作为表情发送的位图格式
+RASTER_FORMATS = {"jpeg", "jpg", "png", "gif", "webp", "bmp"}
+# 确定无法作为表情发送的矢量格式；其余不认识的格式（如 wx_fmt=other、
+# .php 等动态链接）可能是正文图片，先探测再由内容决定
+NON_RASTER_FORMATS = {"svg", "svgz", "svg+xml"}
+# 照片类格式几乎不会是图标，页面没有标注尺寸时也直接下载
+PHOTO_FORMATS = {"jpeg", "jpg"}
+
+# mmbiz 链接的最后一段路径是请求的最大宽度（0 表示原图），如 .../640?wx_fmt=png
+_WIDTH_SEGMENT = re.compile(r"/(\d{1,4})$")
+
+
+class Verdict(str, Enum):
+    KEEP = "keep"
+    DROP = "drop"
+    PROBE = "probe"
+
+
+def _query(url: str) -> dict[str, str]:
+    return {key.lower(): value.lower() for key, value in parse_qsl(urlsplit(url).query)}
+
+
+def image_format(url: str) -> Optional[str]:
+    """从 wx_fmt 参数或扩展名推断图片格式。"""
+    fmt = _query(url).get("wx_fmt")
+    if fmt:
+        return fmt
+    path = urlsplit(url).path.lower()
+    if "." in path.rsplit("/", 1)[-1]:
+        return path.rsplit(".", 1)[-1]
+    return None
+
+
+def url_width_hint(url: str) -> Optional[int]:
+    """链接中声明的宽度（mmbiz 路径末段或 w/width 参数），没有或为 0（原图）时返回 None。"""
+    query = _query(url)
+    for key in ("w", "width"):
+        if query.get(key, "").isdigit():
+            return int(query[key]) or None
+    parts = urlsplit(url)
+    match = _WIDTH_SEGMENT.search(parts.path) if "mmbiz" in parts.netloc else None
+    if match:
+        return int(match.group(1)) or None
+    return None
+
+
+def content_key(url: str) -> str:
+    """
+    去重用的键：同一张图片只是尺寸路径段或懒加载等参数不同时得到相同的键。
+    """
+    parts = urlsplit(url)
+    path = _WIDTH_SEGMENT.sub("", parts.path) if "mmbiz" in parts.netloc else parts.path
+    query = _query(url)
+    ignored = {"wx_lazy", "wx_co", "tp", "wxfrom", "wx_fmt", "from", "w", "width"}
+    kept = sorted((key, value) for key, value in query.items() if key not in ignored)
+    return f"{parts.netloc.lower()}{path}?{kept}"
+
+
+def dedupe(images: Iterable[ArticleImage]) -> list[ArticleImage]:
+    """按文章顺序去掉重复的图片，保留第一次出现的位置。"""
+    seen = set()
+    result = []
+    for image in images:
+        key = content_key(image.url)
+        if key not in seen:
+            seen.add(key)
+            result.append(image)
+    return result
+
+
+def classify(image: ArticleImage, min_dimension: int = MIN_DIMENSION) -> tuple[Verdict, str]:
+    """判断图片是直接下载、直接丢弃还是先探测尺寸，同时返回原因。"""
+    url = image.url.lower()
+    for pattern in JUNK_URL_PATTERNS:
+        if pattern in url:
+            return Verdict.DROP, f"链接包含 {pattern}"
+
+    fmt = image_format(url)
+    if fmt in NON_RASTER_FORMATS:
+        return Verdict.DROP, f"格式 {fmt} 无法作为图片发送"
+    if min_dimension <= 0:
+        return Verdict.KEEP, ""
+
+    if image.width is not None and image.width < min_dimension:
+        return Verdict.DROP, f"标注宽度 {image.width} 过小"
+    if image.height is not None and image.height < min_dimension:
+        return Verdict.DROP, f"标注高度 {image.height} 过小"
+    if image.width is not None and image.height is not None and (fmt is None or fmt in RASTER_FORMATS):
+        return Verdict.KEEP, ""
+
+    width_hint = url_width_hint(url)
+    if width_hint is not None and width_hint < min_dimension:
+        return Verdict.DROP, f"链接宽度 {width_hint} 过小"
+    # 正文中懒加载的照片基本都是内容图片
+    if fmt in PHOTO_FORMATS and "wx_lazy" in _query(url):
+        return Verdict.KEEP, ""
+    return Verdict.PROBE, ""
+
+
+def parse_dimensions(data: bytes) -> Optional[tuple[int, int]]:
+    """从图片开头的字节中读出 (宽, 高)，支持 PNG、GIF、JPEG、WebP、BMP，无法识别时返回 None。"""
+    try:
+        if data.startswith(b"\x89PNG\r\n\x1a\n") and data[12:16] == b"IHDR":
+            return struct.unpack(">II", data[16:24])
+        if data[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack("<HH", data[6:10])
+        if data.startswith(b"BM"):
+            width, height = struct.unpack("<ii", data[18:26])
+            return width, abs(height)
+        if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+            chunk = data[12:16]
+            if chunk == b"VP8 ":
+                width, height = struct.unpack("<HH", data[26:30])
+                return width & 0x3FFF, height & 0x3FFF
+            if chunk == b"VP8L":
+                bits = int.from_bytes(data[21:25], "little")
+                return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+            if chunk == b"VP8X":
+                return int.from_bytes(data[24:27], "little") + 1, int.from_bytes(data[27:30], "little") + 1
+            return None
+        if data.startswith(b"\xff\xd8"):
+            return _jpeg_dimensions(data)
+    except struct.error:
+        return None
+    return None
+
+
+def _jpeg_dimensions(data: bytes) -> Optional[tuple[int, int]]:
+    # 逐个跳过 JPEG 段，直到 SOFn 段
+    offset = 2
+    while offset + 9 < len(data):
+        if data[offset] != 0xFF:
+            return None
+        marker = data[offset + 1]
+        if marker == 0xFF:
+            offset += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            offset += 2
+            continue
+        length = struct.unpack(">H", data[offset + 2:offset + 4])[0]
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack(">HH", data[offset + 5:offset + 9])
+            return width, height
+        offset += 2 + length
+    return None
+
+
+def too_small(dimensions: Optional[tuple[int, int]], min_dimension: int = MIN_DIMENSION) -> bool:
+    return dimensions is not None and min_dimension > 0 and min(dimensions) < min_dimension
@@ -0,0 +1,164 @@
+"""
+按内容寻址的本地图片存储。
+
+图片以 MD5 命名保存在 `wechat_images/<md5 前两位>/<md5>`，SQLite 索引记录
+来源 URL 到 MD5 的映射以及每个文件的大小和最近访问时间。超过容量或保存
+时间上限时按最近最少使用（LRU）顺序淘汰。
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ImageStore:
+    """图片内容存储，所有方法都是同步且线程安全的，应在线程池中调用。"""
+
+    def __init__(
+        self,
+        root: str = "wechat_images",
+        max_bytes: int = 512 * 1024 * 1024,
+        max_age: float = 7 * 24 * 3600,
+    ):
+        self.root = os.path.abspath(root)
+        self.max_bytes = int(max_bytes)
+        self.max_age = float(max_age)
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(self.root, "index.sqlite3"),
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS blobs (
+                digest TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS blobs_last_access ON blobs (last_access);
+            CREATE INDEX IF NOT EXISTS blobs_created_at ON blobs (created_at);
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                digest TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS urls_digest ON urls (digest);
+            """
+        )
+        self._total_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    def path_for(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def lookup(self, url: str) -> Optional[str]:
+        """返回 url 对应且仍然有效的 MD5，不存在或已过期时返回 None。"""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT b.digest, b.created_at FROM urls u JOIN blobs b ON b.digest = u.digest WHERE u.url = ?",
+                (url,),
+            ).fetchone()
+            if row is None:
+                return None
+            digest, created_at = row
+            if self.max_age > 0 and now - created_at > self.max_age:
+                self._remove(digest)
+                return None
+            if not os.path.exists(self.path_for(digest)):
+                self._remove(digest)
+                return None
+            self._db.execute("UPDATE blobs SET last_access = ? WHERE digest = ?", (now, digest))
+            return digest
+
+    def read(self, digest: str) -> Optional[bytes]:
+        try:
+            with open(self.path_for(digest), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def temp_path(self) -> str:
+        """返回缓存目录内的临时文件路径，写完后交给 put_file 登记。"""
+        return os.path.join(self.root, f".{uuid.uuid4().hex}.tmp")
+
+    def put(self, url: str, data: bytes, digest: str) -> str:
+        """保存图片内容并记录 url 映射，相同内容只保存一份。"""
+        tmp_path = self.temp_path()
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        return self.put_file(url, tmp_path, digest, len(data))
+
+    def put_file(self, url: str, tmp_path: str, digest: str, size: int) -> str:
+        """登记已经写入 tmp_path 的图片，返回最终路径；内容已存在时丢弃临时文件。"""
+        path = self.path_for(digest)
+        now = time.time()
+        with self._lock:
+            exists = self._db.execute("SELECT 1 FROM blobs WHERE digest = ?", (digest,)).fetchone()
+            if exists is None or not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+                if exists is None:
+                    self._db.execute(
+                        "INSERT INTO blobs (digest, size, created_at, last_access) VALUES (?, ?, ?, ?)",
+                        (digest, size, now, now),
+                    )
+                    self._total_bytes += size
+            else:
+                os.remove(tmp_path)
+                self._db.execute("UPDATE blobs SET last_access = ? WHERE digest = ?", (now, digest))
+            self._db.execute("INSERT OR REPLACE INTO urls (url, digest) VALUES (?, ?)", (url, digest))
+            self._evict(now)
+        return path
+
+    def link(self, url: str, digest: str) -> bool:
+        """把 url 指向已保存的内容，内容不存在时返回 False。"""
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM blobs WHERE digest = ?", (digest,)).fetchone() is None:
+                return False
+            self._db.execute("INSERT OR REPLACE INTO urls (url, digest) VALUES (?, ?)", (url, digest))
+        return True
+
+    def _remove(self, digest: str) -> None:
+        row = self._db.execute("SELECT size FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        self._db.execute("DELETE FROM urls WHERE digest = ?", (digest,))
+        self._db.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+        if row is not None:
+            self._total_bytes -= row[0]
+        try:
+            os.remove(self.path_for(digest))
+        except OSError:
+            pass
+
+    def _evict(self, now: float) -> None:
+        if self.max_age > 0:
+            expired = self._db.execute(
+                "SELECT digest FROM blobs WHERE created_at < ?", (now - self.max_age,)
+            ).fetchall()
+            for (digest,) in expired:
+                self._remove(digest)
+        if self.max_bytes > 0 and self._total_bytes > self.max_bytes:
+            rows = self._db.execute("SELECT digest FROM blobs ORDER BY last_access").fetchall()
+            for (digest,) in rows:
+                if self._total_bytes <= self.max_bytes:
+                    break
+                self._remove(digest)
+                logger.info(f"图片缓存超出容量，淘汰 {digest}")
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,241 @@
+"""
+发送前的图片转码。
+
+长边超过上限的图片按比例缩小，并按目标格式和质量重新压缩；结果比原图小时
+才替换原图，否则原样发送。动图保留所有帧：目标格式为 WebP 时转为动态 WebP，
+其余情况只缩小尺寸、保持原格式。
+
+解码和编码都是 CPU 密集的操作，在进程池中执行，可以用满所有核心且不阻塞
+事件循环。转码结果保存在 ImageStore 中，以"原图 MD5 + 转码参数"为键，
+同一张图片不会重复转码；发送使用的 MD5 按转码后的内容计算。
+
+依赖 Pillow，未安装时无法开启。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import dataclasses
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING, Optional
+
+try:
+    from PIL import Image, ImageSequence
+except ImportError:  # pragma: no cover - Pillow 是可选依赖，只有开启转码时才需要
+    Image = ImageSequence = None
+
+from stage_metrics import METRICS
+
+from .single_flight import SingleFlight
+
+if TYPE_CHECKING:
+    from .image_downloader import DownloadResult
+    from .image_store import ImageStore
+
+logger = logging.getLogger(__name__)
+
+# 支持的目标格式
+FORMATS = ("JPEG", "WEBP", "PNG")
+DEFAULT_MAX_DIMENSION = 1920
+DEFAULT_QUALITY = 85
+# 小于该大小的图片不转码，节省的空间不值得一次进程间调用
+DEFAULT_MIN_BYTES = 256 * 1024
+
+
+def available() -> bool:
+    return Image is not None
+
+
+def _target_size(size: tuple[int, int], max_dimension: int) -> tuple[int, int]:
+    width, height = size
+    longest = max(width, height)
+    if max_dimension <= 0 or longest <= max_dimension:
+        return size
+    scale = max_dimension / longest
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _has_alpha(image) -> bool:
+    return image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info)
+
+
+def _save_options(fmt: str, quality: int) -> dict:
+    if fmt == "JPEG":
+        return {"quality": quality, "optimize": True, "progressive": True}
+    if fmt == "WEBP":
+        return {"quality": quality, "method": 4}
+    return {"optimize": True}
+
+
+def _encode_still(image, max_dimension: int, fmt: str, quality: int) -> bytes:
+    target = _target_size(image.size, max_dimension)
+    if target != image.size:
+        # JPEG 解码时直接按 1/2、1/4、1/8 缩小，比解码全图后再缩放快得多
+        image.draft("RGB", target)
+    alpha = _has_alpha(image)
+    if alpha and fmt == "JPEG":
+        # JPEG 不支持透明，带透明通道的图片改用 PNG
+        fmt = "PNG"
+    image = image.convert("RGBA" if alpha else "RGB")
+    if image.size != target:
+        image = image.resize(target, Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **_save_options(fmt, quality))
+    return buffer.getvalue()
+
+
+def _encode_animated(image, max_dimension: int, fmt: str, quality: int) -> Optional[bytes]:
+    target = _target_size(image.size, max_dimension)
+    out_format = "WEBP" if fmt == "WEBP" else image.format
+    if target == image.size and out_format == image.format:
+        return None
+    frames, durations = [], []
+    for frame in ImageSequence.Iterator(image):
+        durations.append(frame.info.get("duration", 100))
+        frame = frame.convert("RGBA")
+        if frame.size != target:
+            frame = frame.resize(target, Image.Resampling.LANCZOS)
+        frames.append(frame)
+    options = {"save_all": True, "append_images": frames[1:], "duration": durations, "loop": image.info.get("loop", 0)}
+    if out_format == "WEBP":
+        options["quality"] = quality
+    elif out_format == "GIF":
+        options["disposal"] = 2
+    buffer = io.BytesIO()
+    frames[0].save(buffer, out_format, **options)
+    return buffer.getvalue()
+
+
+def transcode_file(src: str, dst: str, max_dimension: int, fmt: str, quality: int) -> Optional[tuple[int, str]]:
+    """
+    在子进程中执行：缩放并重新压缩 src。
+
+    结果比原图小时写入 dst 并返回 (大小, MD5)，否则返回 None。
+    """
+    with Image.open(src) as image:
+        if getattr(image, "is_animated", False):
+            data = _encode_animated(image, max_dimension, fmt, quality)
+        else:
+            data = _encode_still(image, max_dimension, fmt, quality)
+    if data is None or len(data) >= os.path.getsize(src):
+        return None
+    with open(dst, "wb") as f:
+        f.write(data)
+    return len(data), hashlib.md5(data).hexdigest()
+
+
+class ImageTranscoder:
+    """在进程池中转码已下载的图片，结果保存在 ImageStore 中。"""
+
+    def __init__(
+        self,
+        store: ImageStore,
+        max_dimension: int = DEFAULT_MAX_DIMENSION,
+        fmt: str = "JPEG",
+        quality: int = DEFAULT_QUALITY,
+        min_bytes: int = DEFAULT_MIN_BYTES,
+        workers: int = 0,
+    ):
+        if not available():
+            raise RuntimeError("图片转码需要安装 Pillow：pip install Pillow")
+        fmt = fmt.strip().upper()
+        fmt = "JPEG" if fmt == "JPG" else fmt
+        if fmt not in FORMATS:
+            raise ValueError(f"不支持的转码格式：{fmt}，可选 {', '.join(FORMATS)}")
+        self.store = store
+        # 长边上限（像素），0 表示不缩小，只重新压缩
+        self.max_dimension = max(0, int(max_dimension))
+        self.fmt = fmt
+        self.quality = min(100, max(1, int(quality)))
+        self.min_bytes = max(0, int(min_bytes))
+        # 0 表示使用全部 CPU 核心
+        self.workers = int(workers) or os.cpu_count() or 1
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # 内容相同的图片（链接不同）同时到达时只转码一次
+        self.flights = SingleFlight()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # 使用 spawn 启动子进程，避免 fork 带有多个线程的插件进程
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def key_for(self, digest: str) -> str:
+        """转码结果在 ImageStore 中的键，转码参数变化后会重新转码。"""
+        return f"transcode:{digest}:{self.max_dimension}:{self.fmt}:{self.quality}"
+
+    def _cached(self, key: str) -> Optional[tuple[str, str, int]]:
+        digest = self.store.lookup(key)
+        if digest is None:
+            return None
+        path = self.store.path_for(digest)
+        try:
+            return digest, path, os.path.getsize(path)
+        except OSError:
+            return None
+
+    async def transcode(self, result: DownloadResult) -> DownloadResult:
+        """转码下载结果，返回指向新文件的结果；不需要或无法转码时原样返回。"""
+        if not result.ok or result.path is None or result.size < self.min_bytes:
+            return result
+        loop = asyncio.get_running_loop()
+        key = self.key_for(result.md5)
+        cached = await loop.run_in_executor(None, self._cached, key)
+        METRICS.cache("transcode", hit=cached is not None)
+        if cached is None:
+            cached = await self.flights.do(key, lambda: self._run(result, key))
+            if cached is None:
+                return result
+        digest, path, size = cached
+        if digest == result.md5:
+            # 之前已确认转码后不会更小
+            return result
+        saved = result.size - size
+        METRICS.incr("img.transcoded")
+        METRICS.incr("img.saved_bytes", saved)
+        return dataclasses.replace(result, md5=digest, size=size, path=path, saved=saved)
+
+    async def _run(self, result: DownloadResult, key: str) -> Optional[tuple[str, str, int]]:
+        loop = asyncio.get_running_loop()
+        tmp_path = self.store.temp_path()
+        try:
+            with METRICS.timer("img.transcode"):
+                output = await loop.run_in_executor(
+                    self._pool(), transcode_file,
+                    result.path, tmp_path, self.max_dimension, self.fmt, self.quality,
+                )
+        except Exception as e:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            if isinstance(e, BrokenProcessPool):
+                # 子进程异常退出后进程池不可再用，下次重新创建
+                self._executor = None
+            METRICS.incr("img.transcode_failed")
+            logger.error(f"图片转码失败，发送原图：{str(e) or type(e).__name__}")
+            return None
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            raise
+
+        if output is None:
+            # 记下"转码后不会更小"，下次直接发送原图
+            await loop.run_in_executor(None, self.store.link, key, result.md5)
+            return None
+        size, digest = output
+        path = await loop.run_in_executor(None, self.store.put_file, key, tmp_path, digest, size)
+        return digest, path, size
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,151 @@
+"""
+后台任务队列。
+
+/img、/dy 等耗时命令不在事件处理函数中直接执行，而是提交到有界队列，
+最多同时执行固定数量（workers）的任务。每个用户、每个会话同时运行的任务数
+有上限，超出时任务排队等待；队列已满时直接拒绝，避免突发流量下无限堆积协程。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """队列已满。"""
+
+
+@dataclass
+class Job:
+    """一个后台任务。"""
+
+    user_id: str
+    target_id: str
+    name: str
+    run: Callable[[], Awaitable[None]]
+    id: int = field(default_factory=itertools.count(1).__next__)
+    task: Optional[asyncio.Task] = None
+    # 任务结束（完成、失败或取消）时被设置
+    finished: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+class JobQueue:
+    """
+    带每用户、每会话并发上限的有界任务队列。
+
+    最多同时运行 workers 个任务；任务结束时从队列中按顺序挑选第一个满足
+    用户和会话并发上限的任务补上。
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        max_queue: int = 50,
+        per_user: int = 1,
+        per_target: int = 2,
+    ):
+        self.workers = max(1, int(workers))
+        self.max_queue = max(0, int(max_queue))
+        self.per_user = max(1, int(per_user))
+        self.per_target = max(1, int(per_target))
+        self._pending: deque[Job] = deque()
+        self._running: dict[int, Job] = {}
+        self._user_counts: dict[str, int] = {}
+        self._target_counts: dict[str, int] = {}
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    @property
+    def running(self) -> int:
+        return len(self._running)
+
+    def _can_run(self, job: Job) -> bool:
+        return (
+            self._user_counts.get(job.user_id, 0) < self.per_user
+            and self._target_counts.get(job.target_id, 0) < self.per_target
+        )
+
+    def submit(self, job: Job) -> int:
+        """
+        提交任务，返回排队位置：0 表示已经开始执行，N 表示在队列中排第 N 位。
+
+        队列已满时抛出 QueueFull。
+        """
+        if len(self._running) < self.workers and self._can_run(job):
+            self._start(job)
+            return 0
+        if len(self._pending) >= self.max_queue:
+            raise QueueFull(f"队列已满（{self.max_queue}）")
+        self._pending.append(job)
+        return len(self._pending)
+
+    def _start(self, job: Job) -> None:
+        self._running[job.id] = job
+        self._user_counts[job.user_id] = self._user_counts.get(job.user_id, 0) + 1
+        self._target_counts[job.target_id] = self._target_counts.get(job.target_id, 0) + 1
+        job.task = asyncio.ensure_future(job.run())
+        job.task.add_done_callback(lambda task: self._finish(job, task))
+
+    def _finish(self, job: Job, task: asyncio.Task) -> None:
+        if task.cancelled():
+            logger.info(f"任务 {job.id}（{job.name}）已取消")
+        elif task.exception() is not None:
+            logger.error(f"任务 {job.id}（{job.name}）执行失败：{task.exception()}")
+
+        del self._running[job.id]
+        job.finished.set()
+        for counts, key in ((self._user_counts, job.user_id), (self._target_counts, job.target_id)):
+            counts[key] -= 1
+            if not counts[key]:
+                del counts[key]
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        for job in list(self._pending):
+            if len(self._running) >= self.workers:
+                break
+            if self._can_run(job):
+                self._pending.remove(job)
+                self._start(job)
+
+    def jobs_for(self, user_id: str) -> list[Job]:
+        """返回某个用户运行中和排队中的任务。"""
+        return [job for job in self._running.values() if job.user_id == user_id] + [
+            job for job in self._pending if job.user_id == user_id
+        ]
+
+    def cancel(self, user_id: str, target_id: Optional[str] = None) -> int:
+        """取消某个用户（可限定会话）排队中和运行中的任务，返回取消的数量。"""
+
+        def matches(job: Job) -> bool:
+            return job.user_id == user_id and (target_id is None or job.target_id == target_id)
+
+        cancelled = 0
+        for job in [job for job in self._pending if matches(job)]:
+            self._pending.remove(job)
+            job.finished.set()
+            cancelled += 1
+        for job in list(self._running.values()):
+            if matches(job) and job.task is not None and not job.task.done():
+                job.task.cancel()
+                cancelled += 1
+        return cancelled
+
+    async def stop(self) -> None:
+        """清空队列并取消所有运行中的任务。"""
+        for job in self._pending:
+            job.finished.set()
+        self._pending.clear()
+        tasks = [job.task for job in self._running.values() if job.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
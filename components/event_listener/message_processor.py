@@ -1,64 +1,197 @@
+import os
 import re
 import base64
+import asyncio
+import threading
+from collections import OrderedDict
 from pathlib import Path
+from typing import Iterator, Optional, Union
 from langbot_plugin.api.entities.builtin.platform import message as platform_message
 
+from stage_metrics import METRICS
+
+# 组合所有图片模式：网络图片或本地图片
+IMAGE_PATTERN = re.compile(
+    r'!\[.*?\]\(\s*((?:https?://\S+)|(?:/home/.*?\.png))\s*\)'
+)
+
+# 单张本地图片大小上限的默认值，超过时不读取文件（配置项 local_image_max_mb）
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+# 编码缓存总容量的默认值，按 base64 字符数计（配置项 local_image_cache_mb）
+IMAGE_CACHE_BYTES = 32 * 1024 * 1024
+# 超过该大小的文件放到线程池中读取和编码，避免阻塞事件循环
+INLINE_READ_BYTES = 256 * 1024
+
+
+class LocalImageTooLarge(Exception):
+    """本地图片超过大小上限。"""
+
+
+class EncodedImageCache:
+    """
+    本地图片的 base64 编码缓存。
+
+    以 (路径, mtime, 大小) 为键，文件被修改后自动失效；按总字符数限制容量，
+    超出时淘汰最久未使用的条目。线程安全，可以在线程池中调用 load。
+    """
+
+    def __init__(self, max_bytes: int = IMAGE_CACHE_BYTES, max_image_bytes: int = MAX_IMAGE_BYTES):
+        self.max_bytes = max_bytes
+        self.max_image_bytes = max_image_bytes
+        self.bytes = 0
+        self._entries: OrderedDict[tuple[str, int, int], str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, max_bytes: Optional[int] = None, max_image_bytes: Optional[int] = None) -> None:
+        """修改缓存容量（0 表示不缓存）和单张图片上限（0 表示不限制），缩小容量时立即淘汰。"""
+        with self._lock:
+            if max_bytes is not None:
+                self.max_bytes = max(0, int(max_bytes))
+            if max_image_bytes is not None:
+                self.max_image_bytes = max(0, int(max_image_bytes))
+            self._evict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stat(self, path: Union[str, Path]) -> tuple[tuple[str, int, int], int]:
+        """返回缓存键和文件大小；文件不存在时抛出 FileNotFoundError。"""
+        st = os.stat(path)
+        return (os.path.abspath(path), st.st_mtime_ns, st.st_size), st.st_size
+
+    def lookup(self, key: tuple[str, int, int]) -> Optional[str]:
+        with self._lock:
+            encoded = self._entries.get(key)
+            if encoded is not None:
+                self._entries.move_to_end(key)
+        METRICS.cache("encoded_image", hit=encoded is not None)
+        return encoded
+
+    def check_size(self, path: Union[str, Path], size: int) -> None:
+        if self.max_image_bytes and size > self.max_image_bytes:
+            raise LocalImageTooLarge(f"图片 {path} 大小 {size} 字节，超过上限 {self.max_image_bytes} 字节")
+
+    def load(self, path: Union[str, Path]) -> str:
+        """读取并编码图片，命中缓存时直接返回。"""
+        key, size = self.stat(path)
+        encoded = self.lookup(key)
+        if encoded is not None:
+            return encoded
+        self.check_size(path, size)
+        with open(path, 'rb') as img_file:
+            encoded = base64.b64encode(img_file.read()).decode('utf-8')
+        self._store(key, encoded)
+        return encoded
+
+    def _store(self, key: tuple[str, int, int], encoded: str) -> None:
+        if len(encoded) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= len(previous)
+            self._entries[key] = encoded
+            self.bytes += len(encoded)
+            self._evict()
+
+    async def load_async(self, path: Union[str, Path]) -> str:
+        """同 load；命中缓存和小文件直接返回，未命中缓存的大文件在线程池中读取和编码。"""
+        key, size = self.stat(path)
+        encoded = self.lookup(key)
+        if encoded is not None:
+            return encoded
+        self.check_size(path, size)
+        if size <= INLINE_READ_BYTES:
+            return self.load(path)
+        return await asyncio.get_running_loop().run_in_executor(None, self.load, path)
+
+    def _evict(self) -> None:
+        # 调用方需持有 self._lock
+        while self.bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+
+IMAGE_CACHE = EncodedImageCache()
+
 
 class MessageProcessor:
     @staticmethod
-    def convert_message(message, sender_id, need_at=False):
-        """
-        将消息文本转换为消息链对象，支持解析文本、网络图片和本地路径图片
-        """
-        parts = []
+    def _split(message) -> Iterator[tuple[str, str]]:
+        """按图片标记切分消息，依次产出 ("text", 文本)、("url", 链接) 或 ("path", 本地路径)。"""
         last_end = 0
-        has_image = False
-        
-        # 组合所有图片模式
-        image_pattern = re.compile(
-            r'!\[.*?\]\(\s*((?:https?://\S+)|(?:/home/.*?\.png))\s*\)'  # 网络图片或本地图片
-        )
-        
-        # 处理@功能
-        if need_at:
-            parts.append(platform_message.At(target=sender_id))
-        
-        # 统一处理所有图片
-        for match in image_pattern.finditer(message):
-            has_image = True
+        for match in IMAGE_PATTERN.finditer(message):
             start, end = match.span()
-            
-            # 添加图片前的文本
             if start > last_end:
-                parts.append(platform_message.Plain(text=message[last_end:start]))
-            
-            # 处理图片
+                yield "text", message[last_end:start]
             image_url_or_path = match.group(1)
-            
             if image_url_or_path.startswith(('http://', 'https://')):
-                # 网络图片
-                parts.append(platform_message.Image(url=image_url_or_path))
+                yield "url", image_url_or_path
             else:
-                # 本地图片
-                image_path = Path(image_url_or_path)
-                if image_path.exists():
-                    try:
-                        with open(image_path, 'rb') as img_file:
-                            img_bytes = img_file.read()
-                            img_base64 = base64.b64encode(img_bytes).decode('utf-8')
-                        parts.append(platform_message.Image(base64=img_base64))
-                    except Exception as e:
-                        parts.append(platform_message.Plain(text=f"[Error loading image: {e}]"))
-                else:
-                    parts.append(platform_message.Plain(text=f"[Image not found: {image_url_or_path}]"))
-            
+                yield "path", image_url_or_path
             last_end = end
-        
-        # 添加剩余文本
         if last_end < len(message):
-            parts.append(platform_message.Plain(text=message[last_end:]))
-        elif not has_image:
+            yield "text", message[last_end:]
+
+    @staticmethod
+    def _local_image_error(image_path: str, error: Exception):
+        if isinstance(error, FileNotFoundError):
+            return platform_message.Plain(text=f"[Image not found: {image_path}]")
+        if isinstance(error, LocalImageTooLarge):
+            return platform_message.Plain(text=f"[Image too large: {image_path}]")
+        return platform_message.Plain(text=f"[Error loading image: {error}]")
+
+    @staticmethod
+    def _finish(parts, message, sender_id, need_at):
+        if not parts:
             # 如果没有找到任何图片，添加原始消息
             parts.append(platform_message.Plain(text=message))
-        
-        return parts if parts else [platform_message.Plain(text=message)]
+        # 处理@功能
+        if need_at:
+            parts.insert(0, platform_message.At(target=sender_id))
+        return parts
+
+    @staticmethod
+    def convert_message(message, sender_id, need_at=False):
+        """
+        将消息文本转换为消息链对象，支持解析文本、网络图片和本地路径图片
+
+        本地图片同步读取和编码，在协程中请使用 convert_message_async
+        """
+        parts = []
+        for kind, value in MessageProcessor._split(message):
+            if kind == "text":
+                parts.append(platform_message.Plain(text=value))
+            elif kind == "url":
+                # 网络图片
+                parts.append(platform_message.Image(url=value))
+            else:
+                # 本地图片，重复使用的图片直接取编码缓存
+                try:
+                    parts.append(platform_message.Image(base64=IMAGE_CACHE.load(value)))
+                except Exception as e:
+                    parts.append(MessageProcessor._local_image_error(value, e))
+        return MessageProcessor._finish(parts, message, sender_id, need_at)
+
+    @staticmethod
+    async def convert_message_async(message, sender_id, need_at=False):
+        """
+        同 convert_message，未命中缓存的大图在线程池中读取和编码，不阻塞事件循环
+        """
+        parts = []
+        for kind, value in MessageProcessor._split(message):
+            if kind == "text":
+                parts.append(platform_message.Plain(text=value))
+            elif kind == "url":
+                parts.append(platform_message.Image(url=value))
+            else:
+                try:
+                    parts.append(platform_message.Image(base64=await IMAGE_CACHE.load_async(value)))
+                except Exception as e:
+                    parts.append(MessageProcessor._local_image_error(value, e))
+        return MessageProcessor._finish(parts, message, sender_id, need_at)
@@ -0,0 +1,135 @@
+"""
+出站消息发送调度。
+
+每个会话一个令牌桶，另有一个全局令牌桶，发送前需同时取得两者的令牌。
+发送失败时降低该会话（以及全局）的速率，之后每次成功发送逐步恢复，
+以平台允许的最快速度发送，同时避免在平台限流时持续撞墙。
+
+等待令牌只会挂起发送方协程，后台的图片下载任务不受影响。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, TypeVar
+
+from stage_metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """
+    令牌桶。
+
+    acquire 采用预约方式：立即扣除令牌（允许为负）并返回需要等待的时间，
+    因此并发等待的发送方按到达顺序依次放行。
+    """
+
+    def __init__(self, rate: float, capacity: float, min_rate: float = 0.05):
+        self.base_rate = max(float(rate), min_rate)
+        self.rate = self.base_rate
+        self.min_rate = min_rate
+        self.capacity = max(1.0, float(capacity))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """预约一个令牌，返回需要等待的秒数。"""
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    def idle(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity
+
+    def penalize(self, factor: float = 0.5) -> None:
+        """发送失败：速率减半，并清空积攒的突发额度。"""
+        self._refill(time.monotonic())
+        self.rate = max(self.min_rate, self.rate * factor)
+        self.tokens = min(self.tokens, 0.0)
+
+    def recover(self, step: float = 0.1) -> None:
+        """发送成功：速率向基准值线性恢复。"""
+        if self.rate < self.base_rate:
+            self._refill(time.monotonic())
+            self.rate = min(self.base_rate, self.rate + self.base_rate * step)
+
+
+class SendScheduler:
+    """按会话和全局限速的发送调度器。"""
+
+    def __init__(
+        self,
+        rate: float = 1.0,
+        burst: float = 3,
+        global_rate: float = 5.0,
+        global_burst: float = 10,
+        max_conversations: int = 1024,
+    ):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.max_conversations = max(1, int(max_conversations))
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self._buckets: dict[str, TokenBucket] = {}
+
+    def _bucket_for(self, target_id: str) -> TokenBucket:
+        bucket = self._buckets.get(target_id)
+        if bucket is None:
+            if len(self._buckets) >= self.max_conversations:
+                self._prune()
+            bucket = self._buckets[target_id] = TokenBucket(self.rate, self.burst)
+        return bucket
+
+    def _prune(self) -> None:
+        # 令牌已回满且未被降速的会话桶与新建的桶等价，可以丢弃
+        for target_id in [
+            key for key, bucket in self._buckets.items()
+            if bucket.idle() and bucket.rate >= bucket.base_rate
+        ]:
+            del self._buckets[target_id]
+
+    async def acquire(self, target_id: str) -> None:
+        """等待直到可以向 target_id 发送一条消息。"""
+        delay = self._bucket_for(target_id).reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        delay = self.global_bucket.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def report_success(self, target_id: str) -> None:
+        self._bucket_for(target_id).recover()
+        self.global_bucket.recover()
+
+    def report_failure(self, target_id: str) -> None:
+        bucket = self._bucket_for(target_id)
+        bucket.penalize()
+        self.global_bucket.penalize(factor=0.8)
+        logger.warning(f"向 {target_id} 发送失败，降低发送速率至 {bucket.rate:.2f} 条/秒")
+
+    async def send(self, target_id: str, send: Callable[[], Awaitable[T]]) -> T:
+        """取得令牌后执行 send，并根据结果调整速率；异常原样抛出。"""
+        with METRICS.timer("send.wait"):
+            await self.acquire(target_id)
+        try:
+            with METRICS.timer("send.reply"):
+                result = await send()
+        except Exception:
+            METRICS.incr("send.failed")
+            self.report_failure(target_id)
+            raise
+        self.report_success(target_id)
+        return result
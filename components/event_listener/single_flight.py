@@ -0,0 +1,52 @@
+"""
+进行中请求合并（single-flight）。
+
+同一个键的任务在完成前只会执行一次，期间到达的相同请求直接等待这次执行的
+结果。常见于热门文章或视频在多个群里几乎同时被发送的情况。
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+from stage_metrics import inherit_labels
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """按键合并并发的协程调用。"""
+
+    def __init__(self):
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        # 被合并（没有产生新的上游任务）的调用次数
+        self.shared = 0
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+        """
+        执行 factory() 并返回结果；若相同 key 的任务正在进行，则等待其结果。
+
+        共享任务用 shield 保护，某一个调用方被取消不会取消其他调用方在等待的任务。
+        任务抛出的异常会传递给所有调用方。
+        """
+        future = self._inflight.get(key)
+        if future is not None:
+            self.shared += 1
+            return await asyncio.shield(future)
+
+        future = inherit_labels(asyncio.ensure_future(factory()))
+        self._inflight[key] = future
+
+        def forget(done: asyncio.Future) -> None:
+            if self._inflight.get(key) is done:
+                del self._inflight[key]
+            # 没有调用方再等待时，避免 "exception was never retrieved" 警告
+            if not done.cancelled():
+                done.exception()
+
+        future.add_done_callback(forget)
+        return await asyncio.shield(future)
@@ -0,0 +1,318 @@
+"""
+视频分段并行下载。
+
+"超高清"视频通常有几十 MB，CDN 单连接的速度受延迟限制。服务端支持 Range
+时，把文件切成若干段用多个连接并行下载，各段直接写入预先分配好大小的
+临时文件中各自的位置；不支持 Range 时退回单连接流式下载。
+
+每段的进度记录在 .state 文件中，网络中断后只重新请求未完成的部分，
+进程重启后再次下载同一个视频也会从断点继续。完成后校验文件大小，
+再把临时文件改名为最终文件。
+
+文件读写都在线程池中执行，不阻塞事件循环。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+
+import http_transport
+from stage_metrics import METRICS, inherit_labels
+
+logger = logging.getLogger(__name__)
+
+# 小于两段该大小的文件不分段
+MIN_SEGMENT_BYTES = 1024 * 1024
+# 进度写入 .state 文件的间隔
+STATE_FLUSH_BYTES = 4 * 1024 * 1024
+
+
+class VideoTooLarge(Exception):
+    """视频超过大小上限。"""
+
+
+class VideoDownloadError(Exception):
+    """视频下载失败（重试后仍失败或大小校验不通过）。"""
+
+
+@dataclass
+class Segment:
+    start: int
+    # 包含在内的结束位置
+    end: int
+    done: int = 0
+
+    @property
+    def remaining(self) -> int:
+        return self.end - self.start + 1 - self.done
+
+    @property
+    def complete(self) -> bool:
+        return self.remaining <= 0
+
+
+@dataclass
+class VideoDownload:
+    """视频下载结果。"""
+
+    url: str
+    path: str
+    size: int
+    segments: int = 1
+    # 从上次中断处继续的字节数
+    resumed_bytes: int = 0
+    elapsed: float = 0.0
+    cached: bool = False
+
+
+class VideoDownloader:
+    """分段并行、可断点续传的视频下载器。"""
+
+    def __init__(
+        self,
+        root: str = "douyin_videos",
+        segments: int = 4,
+        max_bytes: int = 200 * 1024 * 1024,
+        headers: Optional[dict[str, Any]] = None,
+        retries: int = 3,
+        chunk_size: int = 256 * 1024,
+        keep_seconds: float = 86400,
+    ):
+        self.root = root
+        self.segments = max(1, int(segments))
+        self.max_bytes = int(max_bytes)
+        self.headers = headers
+        self.retries = max(0, int(retries))
+        self.chunk_size = int(chunk_size)
+        # 已完成的视频保留时间，0 表示不清理
+        self.keep_seconds = float(keep_seconds)
+        os.makedirs(self.root, exist_ok=True)
+
+    def path_for(self, url: str) -> str:
+        parts = urlsplit(url)
+        name = hashlib.sha1(f"{parts.netloc}{parts.path}?{parts.query}".encode()).hexdigest()[:20]
+        return os.path.join(self.root, f"{name}.mp4")
+
+    def _session(self) -> aiohttp.ClientSession:
+        return http_transport.get_transport().async_session("video", self.headers)
+
+    async def _probe(self, session: aiohttp.ClientSession, url: str) -> tuple[Optional[int], bool]:
+        """请求第一个字节，返回 (总大小, 是否支持 Range)。"""
+        async with session.get(url, headers={"Range": "bytes=0-0"}) as response:
+            if response.status == 206:
+                total = response.headers.get("Content-Range", "").rpartition("/")[2]
+                # 总大小未知（如 bytes 0-0/*）时不分段，也不能把本次的 1 字节当作总大小
+                return (int(total), True) if total.isdigit() else (None, False)
+            if response.status != 200:
+                raise VideoDownloadError(f"请求视频失败，状态码：{response.status}")
+            return response.content_length, False
+
+    def plan(self, size: int) -> list[Segment]:
+        count = max(1, min(self.segments, size // MIN_SEGMENT_BYTES))
+        step = -(-size // count)
+        return [Segment(start, min(size, start + step) - 1) for start in range(0, size, step)]
+
+    def _load_state(self, state_path: str, url: str, size: int) -> Optional[list[Segment]]:
+        try:
+            with open(state_path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get("url") != url or state.get("size") != size:
+            return None
+        return [Segment(*item) for item in state.get("segments", [])]
+
+    def _save_state(self, state_path: str, url: str, size: int, segments: list[Segment]) -> None:
+        # 各线程使用各自的临时文件，同时保存时不会互相覆盖写到一半的内容
+        tmp_path = f"{state_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"url": url, "size": size, "segments": [[s.start, s.end, s.done] for s in segments]}, f)
+        os.replace(tmp_path, state_path)
+
+    async def download(self, url: str) -> VideoDownload:
+        """下载视频并返回本地文件，已下载过的视频直接返回。"""
+        loop = asyncio.get_running_loop()
+        path = self.path_for(url)
+        cached_size = await loop.run_in_executor(None, self._cached_size, path)
+        if cached_size is not None:
+            return VideoDownload(url=url, path=path, size=cached_size, cached=True)
+
+        started = time.perf_counter()
+        session = self._session()
+        with METRICS.timer("dy.video_download"):
+            size, ranges = await self._probe(session, url)
+            if size is not None and self.max_bytes > 0 and size > self.max_bytes:
+                raise VideoTooLarge(f"视频大小 {size} 字节超过上限 {self.max_bytes} 字节")
+
+            part_path = f"{path}.part"
+            if ranges and size:
+                segments, resumed = await self._download_ranges(session, url, part_path, size)
+            else:
+                segments, resumed = 1, 0
+                size = await self._download_single(session, url, part_path, size)
+
+            await loop.run_in_executor(None, self._finish, part_path, path, size)
+
+        METRICS.incr("dy.video_bytes", size - resumed)
+        await loop.run_in_executor(None, self.cleanup)
+        return VideoDownload(
+            url=url, path=path, size=size, segments=segments,
+            resumed_bytes=resumed, elapsed=time.perf_counter() - started,
+        )
+
+    def _cached_size(self, path: str) -> Optional[int]:
+        """已下载过的视频的大小，同时刷新修改时间以免被清理。"""
+        try:
+            os.utime(path)
+            return os.path.getsize(path)
+        except OSError:
+            return None
+
+    def _finish(self, part_path: str, path: str, size: int) -> None:
+        actual = os.path.getsize(part_path)
+        if actual != size:
+            raise VideoDownloadError(f"视频大小校验失败：期望 {size} 字节，实际 {actual} 字节")
+        os.replace(part_path, path)
+
+    def _prepare_ranges(self, part_path: str, state_path: str, url: str, size: int) -> list[Segment]:
+        """读取断点，并预先分配文件大小，各段直接写入自己的位置。"""
+        segments = None
+        if os.path.exists(part_path) and os.path.getsize(part_path) == size:
+            segments = self._load_state(state_path, url, size)
+        if segments is None:
+            segments = self.plan(size)
+        with open(part_path, "r+b" if os.path.exists(part_path) else "wb") as f:
+            f.truncate(size)
+        return segments
+
+    async def _download_ranges(
+        self, session: aiohttp.ClientSession, url: str, part_path: str, size: int
+    ) -> tuple[int, int]:
+        loop = asyncio.get_running_loop()
+        state_path = f"{part_path}.state"
+        segments = await loop.run_in_executor(None, self._prepare_ranges, part_path, state_path, url, size)
+        resumed = sum(segment.done for segment in segments)
+        if resumed:
+            logger.info(f"从断点继续下载视频，已完成 {resumed}/{size} 字节")
+
+        flushed = [resumed]
+
+        def snapshot() -> list[Segment]:
+            return [Segment(segment.start, segment.end, segment.done) for segment in segments]
+
+        async def progress() -> None:
+            total = sum(segment.done for segment in segments)
+            if total - flushed[0] >= STATE_FLUSH_BYTES:
+                flushed[0] = total
+                await loop.run_in_executor(None, self._save_state, state_path, url, size, snapshot())
+
+        tasks = [
+            inherit_labels(asyncio.ensure_future(self._fetch_segment(session, url, part_path, segment, progress)))
+            for segment in segments if not segment.complete
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # 一段失败时先停止其余各段，确保不再有写入，再保存进度，下次从断点继续；
+            # 否则重试同一视频时会与仍在后台写入的旧任务同时写同一个文件
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            with contextlib.suppress(OSError):
+                await loop.run_in_executor(None, self._save_state, state_path, url, size, snapshot())
+            raise
+        with contextlib.suppress(OSError):
+            await loop.run_in_executor(None, os.remove, state_path)
+        return len(segments), resumed
+
+    async def _fetch_segment(
+        self, session: aiohttp.ClientSession, url: str, part_path: str, segment: Segment, progress
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        while not segment.complete:
+            offset = segment.start + segment.done
+            try:
+                async with session.get(url, headers={"Range": f"bytes={offset}-{segment.end}"}) as response:
+                    if response.status != 206:
+                        raise VideoDownloadError(f"分段请求失败，状态码：{response.status}")
+                    f = await loop.run_in_executor(None, open, part_path, "r+b")
+                    try:
+                        await loop.run_in_executor(None, f.seek, offset)
+                        async for chunk in response.content.iter_chunked(self.chunk_size):
+                            chunk = chunk[:segment.remaining]
+                            await loop.run_in_executor(None, f.write, chunk)
+                            segment.done += len(chunk)
+                            await progress()
+                            if segment.complete:
+                                break
+                    finally:
+                        # 取消时仍在执行的写入会先完成，close 等待它结束
+                        await loop.run_in_executor(None, f.close)
+                if not segment.complete:
+                    raise VideoDownloadError("分段数据不完整")
+            except (aiohttp.ClientError, asyncio.TimeoutError, VideoDownloadError) as e:
+                attempt += 1
+                if attempt > self.retries:
+                    raise VideoDownloadError(f"分段 {segment.start}-{segment.end} 下载失败：{e}") from e
+                logger.warning(f"分段 {segment.start}-{segment.end} 中断，从 {segment.start + segment.done} 继续：{e}")
+                await asyncio.sleep(min(2 ** attempt * 0.5, 5))
+
+    async def _download_single(
+        self, session: aiohttp.ClientSession, url: str, part_path: str, size: Optional[int]
+    ) -> int:
+        """服务端不支持 Range 时单连接下载，失败后只能从头重试。"""
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        while True:
+            try:
+                written = 0
+                async with session.get(url) as response:
+                    if response.status != 200:
+                        raise VideoDownloadError(f"请求视频失败，状态码：{response.status}")
+                    f = await loop.run_in_executor(None, open, part_path, "wb")
+                    try:
+                        async for chunk in response.content.iter_chunked(self.chunk_size):
+                            written += len(chunk)
+                            if self.max_bytes > 0 and written > self.max_bytes:
+                                raise VideoTooLarge(f"视频超过大小上限 {self.max_bytes} 字节")
+                            await loop.run_in_executor(None, f.write, chunk)
+                    finally:
+                        await loop.run_in_executor(None, f.close)
+                if size is not None and written != size:
+                    raise VideoDownloadError(f"视频数据不完整：{written}/{size} 字节")
+                return written
+            except (aiohttp.ClientError, asyncio.TimeoutError, VideoDownloadError) as e:
+                attempt += 1
+                if attempt > self.retries:
+                    raise VideoDownloadError(f"视频下载失败：{e}") from e
+                logger.warning(f"视频下载中断，重新下载：{e}")
+                await asyncio.sleep(min(2 ** attempt * 0.5, 5))
+
+    def cleanup(self) -> int:
+        """删除超过保留时间的视频（包括未完成的临时文件），返回删除的数量。"""
+        if self.keep_seconds <= 0:
+            return 0
+        deadline = time.time() - self.keep_seconds
+        removed = 0
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file() and entry.stat().st_mtime < deadline:
+                        os.remove(entry.path)
+                        removed += 1
+                except OSError:
+                    pass
+        return removed
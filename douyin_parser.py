@@ -7,18 +7,42 @@
 该协议现在已经被服务端停用，返回 `parse_v2_disabled`。
 这里改为跟随站点当前使用的 v3 协议：先获取 auth，再用 AES-GCM
 加密请求体提交到 parse 接口，最后解密响应数据。
+
+同步接口（parse_video_url / parse_video_urls）基于 requests，供命令行和
+线程中使用；协程中应使用基于 aiohttp 的 parse_video_url_async /
+parse_video_urls_async，避免阻塞事件循环。
+
+auth 与 parse 请求超过近期 p95 耗时仍未返回时会发出一个对冲请求，先返回者胜出；
+上游连续失败时熔断，期间直接报错，由后台任务探测恢复。
+
+解析结果按视频 ID 缓存：短链接先跟随跳转得到 aweme ID（跳转结果同样缓存），
+同一个视频的不同分享文本、不同短链接在缓存有效期内不再请求 kukutool。
 """
 
 from __future__ import annotations
 
+import array
+import asyncio
 import base64
+import copy
+import functools
 import hashlib
 import json
 import os
 import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from typing import Any
+from urllib.parse import parse_qsl, urljoin, urlsplit, urlunsplit
 
+import aiohttp
 import requests
+import http_transport
+from resilience import CircuitBreaker, CircuitOpenError, LatencyTracker, hedged
+from stage_metrics import METRICS
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives.padding import PKCS7
@@ -34,6 +58,25 @@ AUTH_ROUTE = "/api/auth-9e25f1"
 PARSE_ROUTE = "/api/parse"
 REQUEST_VERSION = 3
 REQUEST_PROTOCOL_VERSION = 1
+REQUEST_TIMEOUT = 30
+# auth 上下文的复用时间，服务端拒绝时会提前失效
+AUTH_CONTEXT_TTL = 300
+# 批量解析时同时进行的请求数
+BATCH_CONCURRENCY = 4
+URL_PATTERN = re.compile(r"http[s]?://[^\s]+")
+# 解析结果的缓存时间，需短于视频 CDN 链接的有效期（链接带 x-expires 时取两者较小值）
+RESULT_CACHE_TTL = 600
+RESULT_CACHE_SIZE = 512
+# 短链接到视频 ID 的对应关系不会变化，缓存时间可以长得多
+REDIRECT_CACHE_TTL = 86400
+# 视频链接过期前预留的余量（秒）
+CDN_EXPIRY_MARGIN = 120
+MAX_REDIRECTS = 5
+# 从链接中提取视频 ID：/video/<id>、/note/<id>、/share/video/<id>、modal_id=<id> 等
+VIDEO_ID_PATTERN = re.compile(r"/(?:video|note|slides)/(\d{8,})")
+VIDEO_ID_QUERY_KEYS = ("modal_id", "aweme_id", "item_ids", "vid")
+# 需要跟随跳转才能得到视频 ID 的短链接域名
+SHORT_LINK_HOSTS = {"v.douyin.com", "v.iesdouyin.com"}
 
 ACTIVE_PROFILE = {
     "auth_key_field": "k_9e25f1",
@@ -77,18 +120,39 @@ def base64_custom_decode(value: str) -> str:
     return "".join(decoded_chars)
 
 
+# 响应去混淆的查找表：先异或 XOR_KEY，再把自定义 base64 字母表映射回标准字母表。
+# 两步都是逐字节替换，与按块反转的顺序无关，因此合并为一张表一次完成。
+_CUSTOM_TO_STANDARD = bytes.maketrans(CUSTOM_B64.encode("ascii"), STANDARD_B64.encode("ascii"))
+_DEOBFUSCATE_TABLE = bytes(_CUSTOM_TO_STANDARD[byte ^ XOR_KEY] for byte in range(256))
+
+
+def _block_reverse_bytes(value: bytes, block_size: int = 8) -> bytes:
+    """block_reverse 的字节版本：8 字节块通过 64 位整数的字节交换批量反转。"""
+    full = len(value) - len(value) % block_size
+    if block_size == 8 and full:
+        blocks = array.array("Q", value[:full])
+        blocks.byteswap()
+        return blocks.tobytes() + value[full:][::-1]
+    return b"".join(value[i : i + block_size][::-1] for i in range(0, len(value), block_size))
+
+
+def deobfuscate(value: str) -> bytes:
+    """
+    还原被混淆的 base64 文本，等价于依次执行 xor_string、block_reverse、
+    base64_custom_decode，但直接在字节上通过查找表完成。
+    """
+    return _block_reverse_bytes(value.encode("ascii").translate(_DEOBFUSCATE_TABLE))
+
+
+@functools.lru_cache(maxsize=1)
+def _response_key() -> bytes:
+    return hashlib.sha256(RESPONSE_AES_SECRET.encode("utf-8")).digest()
+
+
 def decrypt_response_payload(data: str, iv: str) -> dict[str, Any]:
-    data = xor_string(data)
-    iv = xor_string(iv)
-    data = block_reverse(data)
-    iv = block_reverse(iv)
-    data = base64_custom_decode(data)
-    iv = base64_custom_decode(iv)
-
-    encrypted_bytes = base64.b64decode(data)
-    iv_bytes = base64.b64decode(iv)
-    response_key = hashlib.sha256(RESPONSE_AES_SECRET.encode("utf-8")).digest()
-    cipher = Cipher(algorithms.AES(response_key), modes.CBC(iv_bytes))
+    encrypted_bytes = base64.b64decode(deobfuscate(data))
+    iv_bytes = base64.b64decode(deobfuscate(iv))
+    cipher = Cipher(algorithms.AES(_response_key()), modes.CBC(iv_bytes))
     decryptor = cipher.decryptor()
     padded = decryptor.update(encrypted_bytes) + decryptor.finalize()
 
@@ -101,18 +165,326 @@ def derive_request_key(auth_key: str, auth_seed: str) -> bytes:
     return hashlib.sha256(f"{auth_key}:{auth_seed}".encode("utf-8")).digest()
 
 
+@dataclass
+class AuthContext:
+    """一次 auth 返回的 key/seed 以及由它们派生的请求加密密钥。"""
+
+    auth_key: str
+    auth_seed: str
+    key: bytes
+    expires_at: float
+
+    @classmethod
+    def from_response(cls, data: dict[str, Any], ttl: float = AUTH_CONTEXT_TTL) -> "AuthContext":
+        auth_key = data[ACTIVE_PROFILE["auth_key_field"]]
+        auth_seed = data[ACTIVE_PROFILE["auth_seed_field"]]
+        return cls(
+            auth_key=auth_key,
+            auth_seed=auth_seed,
+            key=derive_request_key(auth_key, auth_seed),
+            expires_at=time.monotonic() + ttl,
+        )
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+
+class AuthContextCache:
+    """按 (pagePath, mode) 复用 auth 上下文，线程安全。"""
+
+    def __init__(self, ttl: float = AUTH_CONTEXT_TTL):
+        self.ttl = ttl
+        self._entries: dict[tuple[str, bool], AuthContext] = {}
+        self._lock = threading.Lock()
+
+    def get(self, page_path: str, is_batch: bool = False) -> AuthContext | None:
+        with self._lock:
+            context = self._entries.get((page_path, is_batch))
+            if context is not None and context.expired:
+                del self._entries[(page_path, is_batch)]
+                return None
+            return context
+
+    def put(self, page_path: str, is_batch: bool, context: AuthContext) -> None:
+        with self._lock:
+            self._entries[(page_path, is_batch)] = context
+
+    def invalidate(self, context: AuthContext) -> None:
+        """服务端拒绝后丢弃该上下文。"""
+        with self._lock:
+            for key, cached in list(self._entries.items()):
+                if cached is context:
+                    del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+AUTH_CACHE = AuthContextCache()
+
+
+class VideoResultCache:
+    """
+    按视频 ID 缓存解析结果，并缓存短链接到视频 ID 的跳转，线程安全。
+
+    两者都有 TTL 和条目上限，超出时淘汰最久未使用的条目。
+    """
+
+    def __init__(
+        self,
+        ttl: float = RESULT_CACHE_TTL,
+        max_entries: int = RESULT_CACHE_SIZE,
+        redirect_ttl: float = REDIRECT_CACHE_TTL,
+    ):
+        self._results: OrderedDict[str, tuple[dict[str, Any], float]] = OrderedDict()
+        self._redirects: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.configure(ttl, max_entries, redirect_ttl)
+
+    def configure(
+        self,
+        ttl: float | None = None,
+        max_entries: int | None = None,
+        redirect_ttl: float | None = None,
+    ) -> None:
+        if ttl is not None:
+            self.ttl = float(ttl)
+        if max_entries is not None:
+            self.max_entries = max(1, int(max_entries))
+        if redirect_ttl is not None:
+            self.redirect_ttl = float(redirect_ttl)
+
+    @staticmethod
+    def _get(entries: OrderedDict, key: str) -> Any:
+        entry = entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() >= entry[1]:
+            del entries[key]
+            return None
+        entries.move_to_end(key)
+        return entry[0]
+
+    @staticmethod
+    def _put(entries: OrderedDict, key: str, value: Any, ttl: float, max_entries: int) -> None:
+        entries[key] = (value, time.monotonic() + ttl)
+        entries.move_to_end(key)
+        while len(entries) > max_entries:
+            entries.popitem(last=False)
+
+    def __contains__(self, video_id: str) -> bool:
+        with self._lock:
+            return self._get(self._results, video_id) is not None
+
+    def get(self, video_id: str) -> dict[str, Any] | None:
+        """返回缓存结果的副本，调用方可以随意修改。"""
+        with self._lock:
+            result = self._get(self._results, video_id)
+        return copy.deepcopy(result) if result is not None else None
+
+    def put(self, video_id: str, result: dict[str, Any]) -> None:
+        ttl = min(self.ttl, _cdn_ttl(result))
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._put(self._results, video_id, copy.deepcopy(result), ttl, self.max_entries)
+
+    def get_redirect(self, url: str) -> str | None:
+        with self._lock:
+            return self._get(self._redirects, normalize_video_url(url))
+
+    def put_redirect(self, url: str, video_id: str) -> None:
+        with self._lock:
+            # 跳转记录很小，允许比结果多保存一些
+            self._put(self._redirects, normalize_video_url(url), video_id, self.redirect_ttl, self.max_entries * 4)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._results.clear()
+            self._redirects.clear()
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+
+def _cdn_ttl(result: dict[str, Any]) -> float:
+    """结果中视频链接最早的过期时间距现在的秒数，没有过期参数时返回无穷大。"""
+    expires = []
+    for video in result.get("videos") or []:
+        for item in video.get("video_fullinfo") or []:
+            query = dict(parse_qsl(urlsplit(str(item.get("url") or "")).query))
+            value = query.get("x-expires") or query.get("expires")
+            if value and value.isdigit():
+                expires.append(int(value))
+    if not expires:
+        return float("inf")
+    return min(expires) - time.time() - CDN_EXPIRY_MARGIN
+
+
+RESULT_CACHE = VideoResultCache()
+
+# 上游容错：auth / parse 分别统计耗时，用 p95 作为对冲延迟；两者共用一个熔断器
+HEDGE_ENABLED = True
+AUTH_LATENCY = LatencyTracker()
+PARSE_LATENCY = LatencyTracker()
+
+
+def _is_upstream_failure(exc: BaseException) -> bool:
+    """只有连接错误、超时、5xx 和 429 计入熔断，4xx 等业务错误不算上游故障。"""
+    if isinstance(exc, requests.exceptions.HTTPError):
+        status = exc.response.status_code if exc.response is not None else 500
+        return status >= 500 or status == 429
+    if isinstance(exc, aiohttp.ClientResponseError):
+        return exc.status >= 500 or exc.status == 429
+    return isinstance(exc, (requests.exceptions.RequestException, aiohttp.ClientError, asyncio.TimeoutError))
+
+
+async def _probe_upstream() -> None:
+    # 熔断期间的恢复探测：获取一次 auth，不产生解析请求
+    await _fetch_auth_context_async(build_async_session(), "https://v.douyin.com/", "/")
+
+
+BREAKER = CircuitBreaker("抖音解析服务", probe=_probe_upstream)
+
+
+def configure_resilience(
+    hedge: bool = True,
+    failure_threshold: int = 5,
+    reset_timeout: float = 30,
+) -> None:
+    """调整对冲和熔断配置。"""
+    global HEDGE_ENABLED
+    HEDGE_ENABLED = bool(hedge)
+    BREAKER.failure_threshold = max(1, int(failure_threshold))
+    BREAKER.reset_timeout = float(reset_timeout)
+    BREAKER.record_success()
+
+
+def _call_upstream(func, tracker: LatencyTracker):
+    """在熔断器保护下执行同步请求（同步请求不对冲）。"""
+    started = time.perf_counter()
+    result = BREAKER.call_sync(func, _is_upstream_failure)
+    tracker.observe(time.perf_counter() - started)
+    return result
+
+
+async def _call_upstream_async(factory, tracker: LatencyTracker):
+    """在熔断器保护下执行请求，超过 p95 未返回时对冲。"""
+    delay = tracker.hedge_delay() if HEDGE_ENABLED else None
+    return await BREAKER.call(lambda: hedged(factory, delay, tracker), _is_upstream_failure)
+
+
 def build_session() -> requests.Session:
-    session = requests.Session()
-    session.headers.update(DEFAULT_HEADERS)
-    return session
+    """返回挂载在共享连接池上的会话，多次调用复用同一个会话。"""
+    return http_transport.get_transport().session("douyin", DEFAULT_HEADERS)
+
+
+def build_async_session() -> aiohttp.ClientSession:
+    """返回当前事件循环中复用的 aiohttp 会话。"""
+    return http_transport.get_transport().async_session("douyin", DEFAULT_HEADERS)
+
+
+def _share_headers() -> dict[str, str]:
+    # 跟随抖音短链接跳转时只需要浏览器 UA，不能带上 kukutool 的 Origin/Referer
+    return {"User-Agent": DEFAULT_HEADERS["User-Agent"]}
 
 
 def extract_url(text: str) -> str | None:
     """从分享文本中提取第一个 URL。"""
-    match = re.search(r"http[s]?://[^\s]+", text)
+    match = URL_PATTERN.search(text)
     return match.group(0) if match else None
 
 
+def extract_urls(text: str) -> list[str]:
+    """从分享文本中按出现顺序提取所有 URL，重复的只保留一个。"""
+    return list(dict.fromkeys(URL_PATTERN.findall(text)))
+
+
+def normalize_video_url(url: str) -> str:
+    """规范化分享链接，用于判断两个请求是否指向同一个链接。"""
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ""))
+
+
+def video_id_from_url(url: str) -> str | None:
+    """从完整的视频页链接中提取 aweme ID，短链接等不含 ID 的链接返回 None。"""
+    parts = urlsplit(url)
+    match = VIDEO_ID_PATTERN.search(parts.path)
+    if match:
+        return match.group(1)
+    query = dict(parse_qsl(parts.query))
+    for key in VIDEO_ID_QUERY_KEYS:
+        value = query.get(key, "").split(",")[0]
+        if value.isdigit():
+            return value
+    return None
+
+
+def resolve_video_id(url: str, session: requests.Session | None = None) -> str | None:
+    """
+    返回链接对应的视频 ID，短链接跟随跳转（不下载页面）得到，结果会被缓存。
+
+    无法确定时返回 None，调用方应直接解析而不使用缓存。
+    """
+    video_id = video_id_from_url(url)
+    if video_id is not None or urlsplit(url).netloc.lower() not in SHORT_LINK_HOSTS:
+        return video_id
+    video_id = RESULT_CACHE.get_redirect(url)
+    METRICS.cache("dy.redirect", hit=video_id is not None)
+    if video_id is not None:
+        return video_id
+
+    session = session or http_transport.get_transport().session("douyin-share", _share_headers())
+    current = url
+    try:
+        with METRICS.timer("dy.resolve"):
+            for _ in range(MAX_REDIRECTS):
+                with session.get(current, allow_redirects=False, stream=True, timeout=REQUEST_TIMEOUT) as response:
+                    location = response.headers.get("Location")
+                if not location or response.status_code not in (301, 302, 303, 307, 308):
+                    return None
+                current = urljoin(current, location)
+                video_id = video_id_from_url(current)
+                if video_id is not None:
+                    RESULT_CACHE.put_redirect(url, video_id)
+                    return video_id
+    except requests.exceptions.RequestException:
+        return None
+    return None
+
+
+async def resolve_video_id_async(url: str) -> str | None:
+    """resolve_video_id 的协程版本。"""
+    video_id = video_id_from_url(url)
+    if video_id is not None or urlsplit(url).netloc.lower() not in SHORT_LINK_HOSTS:
+        return video_id
+    video_id = RESULT_CACHE.get_redirect(url)
+    METRICS.cache("dy.redirect", hit=video_id is not None)
+    if video_id is not None:
+        return video_id
+
+    session = http_transport.get_transport().async_session("douyin-share", _share_headers())
+    current = url
+    try:
+        with METRICS.timer("dy.resolve"):
+            for _ in range(MAX_REDIRECTS):
+                async with session.get(current, allow_redirects=False) as response:
+                    location = response.headers.get("Location")
+                if not location or response.status not in (301, 302, 303, 307, 308):
+                    return None
+                current = urljoin(current, location)
+                video_id = video_id_from_url(current)
+                if video_id is not None:
+                    RESULT_CACHE.put_redirect(url, video_id)
+                    return video_id
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        return None
+    return None
+
+
 def _normalize_result(data: dict[str, Any]) -> dict[str, Any]:
     videos = data.get("videos")
     if isinstance(videos, list):
@@ -139,55 +511,59 @@ def _fetch_auth_context(
             "pagePath": page_path,
             "mode": "batch" if is_batch else "single",
         },
-        timeout=30,
+        timeout=REQUEST_TIMEOUT,
     )
     response.raise_for_status()
     return response.json()
 
 
+def _get_auth_context(
+    session: requests.Session,
+    request_url: str,
+    page_path: str,
+    is_batch: bool = False,
+) -> tuple[AuthContext, bool]:
+    """返回 auth 上下文以及它是否来自缓存。"""
+    context = AUTH_CACHE.get(page_path, is_batch)
+    METRICS.cache("dy.auth", hit=context is not None)
+    if context is not None:
+        return context, True
+    with METRICS.timer("dy.auth"):
+        data = _call_upstream(
+            lambda: _fetch_auth_context(session, request_url, page_path, is_batch),
+            AUTH_LATENCY,
+        )
+    context = AuthContext.from_response(data, ttl=AUTH_CACHE.ttl)
+    AUTH_CACHE.put(page_path, is_batch, context)
+    return context, False
+
+
 def _build_encrypted_request(
     params: dict[str, Any],
-    auth_context: dict[str, Any],
+    auth_context: AuthContext | dict[str, Any],
 ) -> dict[str, Any]:
-    auth_key = auth_context[ACTIVE_PROFILE["auth_key_field"]]
-    auth_seed = auth_context[ACTIVE_PROFILE["auth_seed_field"]]
-    key = derive_request_key(auth_key, auth_seed)
+    if not isinstance(auth_context, AuthContext):
+        auth_context = AuthContext.from_response(auth_context)
     nonce = os.urandom(12)
     plaintext = json.dumps(params, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
-    payload = AESGCM(key).encrypt(nonce, plaintext, None)
+    payload = AESGCM(auth_context.key).encrypt(nonce, plaintext, None)
 
     return {
         "version": REQUEST_VERSION,
-        ACTIVE_PROFILE["parse_key_field"]: auth_key,
+        ACTIVE_PROFILE["parse_key_field"]: auth_context.auth_key,
         ACTIVE_PROFILE["parse_payload_field"]: base64.b64encode(payload).decode("ascii"),
         ACTIVE_PROFILE["parse_iv_field"]: base64.b64encode(nonce).decode("ascii"),
         ACTIVE_PROFILE["parse_version_field"]: REQUEST_PROTOCOL_VERSION,
     }
 
 
-def parse_video_url(
+def _build_parse_params(
     request_url: str,
     captcha_key: str = "",
     captcha_input: str = "",
 ) -> dict[str, Any]:
-    """
-    解析抖音视频 URL 或分享文本。
-
-    Args:
-        request_url: 抖音视频 URL 或完整分享文本
-        captcha_key: 验证码 key
-        captcha_input: 验证码输入
-
-    Returns:
-        解析后的字典
-    """
-    extracted_url = extract_url(request_url) or request_url.strip()
-    if not extracted_url:
-        raise DouyinParseError("未找到有效的抖音链接")
-
-    session = build_session()
-    payload_params = {
-        "requestURL": extracted_url,
+    return {
+        "requestURL": request_url,
         "captchaKey": captcha_key,
         "captchaInput": captcha_input,
         "totalSuccessCount": "0",
@@ -199,25 +575,42 @@ def parse_video_url(
         "geoipIp": "",
     }
 
-    try:
-        auth_context = _fetch_auth_context(
-            session=session,
-            request_url=extracted_url,
-            page_path=payload_params["pagePath"],
-        )
-        request_body = _build_encrypted_request(payload_params, auth_context)
+
+def _post_parse(
+    session: requests.Session,
+    payload_params: dict[str, Any],
+    auth_context: AuthContext,
+) -> dict[str, Any]:
+    request_body = _build_encrypted_request(payload_params, auth_context)
+
+    def post() -> dict[str, Any]:
         response = session.post(
             f"{BASE_URL}{PARSE_ROUTE}",
             json=request_body,
-            timeout=30,
+            timeout=REQUEST_TIMEOUT,
         )
         response.raise_for_status()
-        result = response.json()
-    except requests.exceptions.RequestException as exc:
-        raise DouyinParseError(f"请求失败: {exc}") from exc
-    except KeyError as exc:
-        raise DouyinParseError(f"解析协议字段缺失: {exc}") from exc
+        return response.json()
 
+    with METRICS.timer("dy.parse"):
+        return _call_upstream(post, PARSE_LATENCY)
+
+
+# 复用的 auth 被服务端作废时 parse 接口的 HTTP 状态码，以及 reason/message 中的关键字；
+# 视频不存在、上游错误等其他失败直接返回，不必重新认证
+AUTH_REJECTION_STATUSES = {401, 403}
+AUTH_REJECTION_MARKERS = ("auth", "token", "expired")
+
+
+def _is_auth_rejection(result: dict[str, Any]) -> bool:
+    if result.get("status") == 0:
+        return False
+    detail = f"{result.get('reason') or ''} {result.get('message') or ''}".lower()
+    return any(marker in detail for marker in AUTH_REJECTION_MARKERS)
+
+
+def _unpack_result(result: dict[str, Any]) -> dict[str, Any]:
+    """检查 parse 接口的返回状态，解密并规范化数据。"""
     if result.get("status") != 0:
         reason = result.get("reason")
         message = result.get("message")
@@ -227,7 +620,8 @@ def parse_video_url(
     data = result.get("data")
     if result.get("encrypt"):
         try:
-            data = decrypt_response_payload(result["data"], result["iv"])
+            with METRICS.timer("dy.decrypt"):
+                data = decrypt_response_payload(result["data"], result["iv"])
         except Exception as exc:  # noqa: BLE001
             raise DouyinParseError(f"响应解密失败: {exc}") from exc
 
@@ -237,6 +631,330 @@ def parse_video_url(
     return _normalize_result(data)
 
 
+def parse_video_url(
+    request_url: str,
+    captcha_key: str = "",
+    captcha_input: str = "",
+) -> dict[str, Any]:
+    """
+    解析抖音视频 URL 或分享文本。
+
+    auth 上下文会在多次调用之间复用；复用的上下文被服务端拒绝时，
+    自动重新获取一次 auth 并重试。
+
+    Args:
+        request_url: 抖音视频 URL 或完整分享文本
+        captcha_key: 验证码 key
+        captcha_input: 验证码输入
+
+    Returns:
+        解析后的字典
+    """
+    extracted_url = extract_url(request_url) or request_url.strip()
+    if not extracted_url:
+        raise DouyinParseError("未找到有效的抖音链接")
+
+    return _parse_cached(build_session(), extracted_url, captcha_key, captcha_input)
+
+
+def _cached_result(video_id: str | None) -> dict[str, Any] | None:
+    if video_id is None:
+        return None
+    result = RESULT_CACHE.get(video_id)
+    METRICS.cache("dy.result", hit=result is not None)
+    return result
+
+
+def _needs_parse(video_ids: list[str | None]) -> bool:
+    """批量解析中是否有链接需要请求 kukutool（全部命中缓存时不必获取 auth）。"""
+    return any(video_id is None or video_id not in RESULT_CACHE for video_id in video_ids)
+
+
+def _parse_cached(
+    session: requests.Session,
+    extracted_url: str,
+    captcha_key: str = "",
+    captcha_input: str = "",
+    is_batch: bool = False,
+    video_id: str | None = None,
+) -> dict[str, Any]:
+    """先按视频 ID 查缓存，未命中时解析并写入缓存。"""
+    video_id = video_id or resolve_video_id(extracted_url)
+    result = _cached_result(video_id)
+    if result is not None:
+        return result
+    result = _parse_one(session, extracted_url, captcha_key, captcha_input, is_batch)
+    if video_id is not None:
+        RESULT_CACHE.put(video_id, result)
+    return result
+
+
+def _parse_one(
+    session: requests.Session,
+    extracted_url: str,
+    captcha_key: str = "",
+    captcha_input: str = "",
+    is_batch: bool = False,
+) -> dict[str, Any]:
+    payload_params = _build_parse_params(extracted_url, captcha_key, captcha_input)
+
+    try:
+        auth_context, from_cache = _get_auth_context(
+            session=session,
+            request_url=extracted_url,
+            page_path=payload_params["pagePath"],
+            is_batch=is_batch,
+        )
+        try:
+            result = _post_parse(session, payload_params, auth_context)
+        except requests.exceptions.HTTPError as exc:
+            status = exc.response.status_code if exc.response is not None else None
+            if not from_cache or status not in AUTH_REJECTION_STATUSES:
+                raise
+            result = None
+        if from_cache and (result is None or _is_auth_rejection(result)):
+            # 复用的 auth 可能已被服务端作废，重新认证后重试一次
+            AUTH_CACHE.invalidate(auth_context)
+            auth_context, _ = _get_auth_context(
+                session=session,
+                request_url=extracted_url,
+                page_path=payload_params["pagePath"],
+                is_batch=is_batch,
+            )
+            result = _post_parse(session, payload_params, auth_context)
+    except CircuitOpenError as exc:
+        raise DouyinParseError(str(exc)) from exc
+    except requests.exceptions.RequestException as exc:
+        raise DouyinParseError(f"请求失败: {exc}") from exc
+    except KeyError as exc:
+        raise DouyinParseError(f"解析协议字段缺失: {exc}") from exc
+
+    return _unpack_result(result)
+
+
+@dataclass
+class BatchParseResult:
+    """批量解析中单个链接的结果，result 与 error 二选一。"""
+
+    url: str
+    result: dict[str, Any] | None = None
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def parse_video_urls(
+    texts: list[str] | str,
+    max_workers: int = BATCH_CONCURRENCY,
+) -> list[BatchParseResult]:
+    """
+    批量解析多个抖音链接。
+
+    从每段分享文本中提取所有 URL（去重），使用批量模式的 auth 并发解析，
+    单个链接失败不影响其他链接。
+
+    Args:
+        texts: 一段或多段分享文本
+        max_workers: 同时进行的解析请求数
+
+    Returns:
+        与提取出的 URL 一一对应的结果列表
+    """
+    if isinstance(texts, str):
+        texts = [texts]
+    urls = list(dict.fromkeys(url for text in texts for url in extract_urls(text)))
+    if not urls:
+        return []
+
+    session = build_session()
+    workers = max(1, min(max_workers, len(urls)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        video_ids = list(executor.map(resolve_video_id, urls))
+        if _needs_parse(video_ids):
+            try:
+                # 先取得一次批量模式的 auth，避免并发请求同时去认证
+                _get_auth_context(session, urls[0], "/", is_batch=True)
+            except (requests.exceptions.RequestException, KeyError, CircuitOpenError):
+                pass
+
+        def parse(url: str, video_id: str | None) -> BatchParseResult:
+            try:
+                return BatchParseResult(
+                    url=url, result=_parse_cached(session, url, is_batch=True, video_id=video_id)
+                )
+            except DouyinParseError as exc:
+                return BatchParseResult(url=url, error=str(exc))
+
+        return list(executor.map(parse, urls, video_ids))
+
+
+async def _fetch_auth_context_async(
+    session: aiohttp.ClientSession,
+    request_url: str,
+    page_path: str,
+    is_batch: bool = False,
+) -> dict[str, Any]:
+    async with session.post(
+        f"{BASE_URL}{AUTH_ROUTE}",
+        json={
+            "requestURL": request_url,
+            "pagePath": page_path,
+            "mode": "batch" if is_batch else "single",
+        },
+    ) as response:
+        response.raise_for_status()
+        return await response.json(content_type=None)
+
+
+async def _get_auth_context_async(
+    session: aiohttp.ClientSession,
+    request_url: str,
+    page_path: str,
+    is_batch: bool = False,
+) -> tuple[AuthContext, bool]:
+    context = AUTH_CACHE.get(page_path, is_batch)
+    METRICS.cache("dy.auth", hit=context is not None)
+    if context is not None:
+        return context, True
+    with METRICS.timer("dy.auth"):
+        data = await _call_upstream_async(
+            lambda: _fetch_auth_context_async(session, request_url, page_path, is_batch),
+            AUTH_LATENCY,
+        )
+    context = AuthContext.from_response(data, ttl=AUTH_CACHE.ttl)
+    AUTH_CACHE.put(page_path, is_batch, context)
+    return context, False
+
+
+async def _post_parse_async(
+    session: aiohttp.ClientSession,
+    payload_params: dict[str, Any],
+    auth_context: AuthContext,
+) -> dict[str, Any]:
+    async def post() -> dict[str, Any]:
+        # 对冲请求也重新加密，每次使用新的 nonce，上游不会收到完全相同的请求
+        request_body = _build_encrypted_request(payload_params, auth_context)
+        async with session.post(
+            f"{BASE_URL}{PARSE_ROUTE}",
+            json=request_body,
+        ) as response:
+            response.raise_for_status()
+            return await response.json(content_type=None)
+
+    with METRICS.timer("dy.parse"):
+        return await _call_upstream_async(post, PARSE_LATENCY)
+
+
+async def _parse_one_async(
+    session: aiohttp.ClientSession,
+    extracted_url: str,
+    captcha_key: str = "",
+    captcha_input: str = "",
+    is_batch: bool = False,
+) -> dict[str, Any]:
+    payload_params = _build_parse_params(extracted_url, captcha_key, captcha_input)
+
+    try:
+        auth_context, from_cache = await _get_auth_context_async(
+            session=session,
+            request_url=extracted_url,
+            page_path=payload_params["pagePath"],
+            is_batch=is_batch,
+        )
+        try:
+            result = await _post_parse_async(session, payload_params, auth_context)
+        except aiohttp.ClientResponseError as exc:
+            if not from_cache or exc.status not in AUTH_REJECTION_STATUSES:
+                raise
+            result = None
+        if from_cache and (result is None or _is_auth_rejection(result)):
+            # 复用的 auth 可能已被服务端作废，重新认证后重试一次
+            AUTH_CACHE.invalidate(auth_context)
+            auth_context, _ = await _get_auth_context_async(
+                session=session,
+                request_url=extracted_url,
+                page_path=payload_params["pagePath"],
+                is_batch=is_batch,
+            )
+            result = await _post_parse_async(session, payload_params, auth_context)
+    except CircuitOpenError as exc:
+        raise DouyinParseError(str(exc)) from exc
+    except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+        raise DouyinParseError(f"请求失败: {str(exc) or type(exc).__name__}") from exc
+    except KeyError as exc:
+        raise DouyinParseError(f"解析协议字段缺失: {exc}") from exc
+
+    return _unpack_result(result)
+
+
+async def parse_video_url_async(
+    request_url: str,
+    captcha_key: str = "",
+    captcha_input: str = "",
+) -> dict[str, Any]:
+    """parse_video_url 的协程版本，使用非阻塞 I/O。"""
+    extracted_url = extract_url(request_url) or request_url.strip()
+    if not extracted_url:
+        raise DouyinParseError("未找到有效的抖音链接")
+
+    return await _parse_cached_async(build_async_session(), extracted_url, captcha_key, captcha_input)
+
+
+async def _parse_cached_async(
+    session: aiohttp.ClientSession,
+    extracted_url: str,
+    captcha_key: str = "",
+    captcha_input: str = "",
+    is_batch: bool = False,
+    video_id: str | None = None,
+) -> dict[str, Any]:
+    """_parse_cached 的协程版本。"""
+    video_id = video_id or await resolve_video_id_async(extracted_url)
+    result = _cached_result(video_id)
+    if result is not None:
+        return result
+    result = await _parse_one_async(session, extracted_url, captcha_key, captcha_input, is_batch)
+    if video_id is not None:
+        RESULT_CACHE.put(video_id, result)
+    return result
+
+
+async def parse_video_urls_async(
+    texts: list[str] | str,
+    max_concurrency: int = BATCH_CONCURRENCY,
+) -> list[BatchParseResult]:
+    """parse_video_urls 的协程版本，使用非阻塞 I/O。"""
+    if isinstance(texts, str):
+        texts = [texts]
+    urls = list(dict.fromkeys(url for text in texts for url in extract_urls(text)))
+    if not urls:
+        return []
+
+    session = build_async_session()
+    video_ids = await asyncio.gather(*(resolve_video_id_async(url) for url in urls))
+    if _needs_parse(video_ids):
+        try:
+            # 先取得一次批量模式的 auth，避免并发请求同时去认证
+            await _get_auth_context_async(session, urls[0], "/", is_batch=True)
+        except (aiohttp.ClientError, asyncio.TimeoutError, KeyError, CircuitOpenError):
+            pass
+
+    limit = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def parse(url: str, video_id: str | None) -> BatchParseResult:
+        async with limit:
+            try:
+                return BatchParseResult(
+                    url=url, result=await _parse_cached_async(session, url, is_batch=True, video_id=video_id)
+                )
+            except DouyinParseError as exc:
+                return BatchParseResult(url=url, error=str(exc))
+
+    return list(await asyncio.gather(*(parse(url, video_id) for url, video_id in zip(urls, video_ids))))
+
+
 def main() -> None:
     text = (
         "2.00 eBT:/ 03/20 L@J.vF :2pm 复制打开抖音极速版，看看【七分情感（教学）的作品】"
@@ -0,0 +1,284 @@
+"""
+共享的 HTTP 传输层。
+
+微信文章、图片下载和抖音解析共用同一组连接池：按 host 复用 keep-alive
+连接，并缓存 DNS 解析结果，避免每个请求都重新做 TCP + TLS 握手。
+
+同步代码使用 requests 会话（session），协程使用 aiohttp 会话
+（async_session），两者使用相同的连接池大小、超时和 DNS 缓存配置。
+只有 requests 会话在传输层对连接错误和 5xx 自动重试；aiohttp 会话不重试，
+由调用方自行处理（抖音解析的熔断与对冲、视频分段的断点续传）。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import socket
+import threading
+import time
+from typing import Any, Optional
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+from urllib3.util.retry import Retry
+
+
+DEFAULT_TIMEOUT = (5, 10)
+DEFAULT_POOL_CONNECTIONS = 16
+DEFAULT_POOL_MAXSIZE = 16
+DEFAULT_DNS_TTL = 300
+
+
+class DNSCache:
+    """带 TTL 的 DNS 解析缓存，保存解析到的全部地址。"""
+
+    def __init__(self, ttl: float = DEFAULT_DNS_TTL):
+        self.ttl = ttl
+        self._entries: dict[tuple[str, int], tuple[float, list[str]]] = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, host: str, port: int) -> list[str]:
+        """
+        返回 host 的全部缓存地址（按 getaddrinfo 的顺序），解析失败时返回 [host]
+        交给 urllib3 处理。地址族遵循 urllib3 的设置（不支持 IPv6 时只取 IPv4）。
+        """
+        if self.ttl <= 0:
+            return [host]
+        key = (host, port)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                return list(entry[1])
+        try:
+            infos = socket.getaddrinfo(host, port, allowed_gai_family(), socket.SOCK_STREAM)
+        except OSError:
+            return [host]
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        if not addresses:
+            return [host]
+        with self._lock:
+            self._entries[key] = (now + self.ttl, addresses)
+        return list(addresses)
+
+    def demote(self, host: str, port: int, address: str) -> None:
+        """连接失败的地址移到末尾，之后的新连接优先尝试其他地址。"""
+        with self._lock:
+            entry = self._entries.get((host, port))
+            if entry is not None and address in entry[1]:
+                entry[1].remove(address)
+                entry[1].append(address)
+
+    def evict(self, host: str, port: int) -> None:
+        with self._lock:
+            self._entries.pop((host, port), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class _CachedDNSMixin:
+    # 由 PooledHTTPAdapter 为每个传输层生成的子类设置
+    dns_cache: DNSCache
+
+    def _new_conn(self):
+        # 只替换用于建立 socket 的地址，Host 头与 TLS SNI 仍使用原始域名。
+        # 与 socket.create_connection 一样依次尝试每个地址，全部失败时丢弃缓存
+        original = self._dns_host
+        addresses = self.dns_cache.resolve(original, self.port)
+        error = None
+        try:
+            for address in addresses:
+                self._dns_host = address
+                try:
+                    return super()._new_conn()
+                except (ConnectTimeoutError, NewConnectionError) as e:
+                    error = e
+                    self.dns_cache.demote(original, self.port, address)
+        finally:
+            self._dns_host = original
+        self.dns_cache.evict(original, self.port)
+        raise error
+
+
+class _CachedDNSHTTPConnection(_CachedDNSMixin, HTTPConnection):
+    pass
+
+
+class _CachedDNSHTTPSConnection(_CachedDNSMixin, HTTPSConnection):
+    pass
+
+
+def _pool_classes(dns_cache: DNSCache) -> dict[str, type]:
+    """生成使用指定 DNS 缓存的连接池类（urllib3 不允许通过连接参数传入）。"""
+
+    def pool_class(pool_cls, conn_cls):
+        connection = type(conn_cls.__name__, (conn_cls,), {"dns_cache": dns_cache})
+        return type(f"_CachedDNS{pool_cls.__name__}", (pool_cls,), {"ConnectionCls": connection})
+
+    return {
+        "http": pool_class(HTTPConnectionPool, _CachedDNSHTTPConnection),
+        "https": pool_class(HTTPSConnectionPool, _CachedDNSHTTPSConnection),
+    }
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """使用 DNS 缓存连接池的 HTTPAdapter。"""
+
+    def __init__(self, *args, dns_cache: Optional[DNSCache] = None, **kwargs):
+        # HTTPAdapter.__init__ 会调用 init_poolmanager，需要先设置
+        self.dns_cache = dns_cache if dns_cache is not None else DNSCache()
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = _pool_classes(self.dns_cache)
+
+
+class TransportSession(requests.Session):
+    """未显式传入 timeout 时使用传输层默认超时的会话。"""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT):
+        super().__init__()
+        self.default_timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.default_timeout
+        return super().request(method, url, **kwargs)
+
+
+class HTTPTransport:
+    """
+    进程内共享的连接池。
+
+    所有通过 session() 取得的会话都挂载同一个 adapter，因此不同用途的请求
+    （不同默认请求头）也共享 keep-alive 连接。
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+        pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+        timeout=DEFAULT_TIMEOUT,
+        max_retries: int = 3,
+        backoff_factor: float = 1,
+        dns_ttl: float = DEFAULT_DNS_TTL,
+    ):
+        self.pool_connections = int(pool_connections)
+        self.pool_maxsize = int(pool_maxsize)
+        self.timeout = timeout
+        self.retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=[500, 502, 503, 504],
+        )
+        # 每个传输层使用自己的 DNS 缓存和 TTL
+        self.dns_cache = DNSCache(dns_ttl)
+        self.adapter = PooledHTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=self.retry,
+            dns_cache=self.dns_cache,
+        )
+        self._sessions: dict[str, TransportSession] = {}
+        self._async_sessions: dict[tuple[str, int], tuple[asyncio.AbstractEventLoop, aiohttp.ClientSession]] = {}
+        self._lock = threading.Lock()
+
+    def create_session(self, headers: Optional[dict[str, Any]] = None) -> TransportSession:
+        """创建一个挂载共享连接池的新会话。"""
+        session = TransportSession(timeout=self.timeout)
+        session.mount("http://", self.adapter)
+        session.mount("https://", self.adapter)
+        if headers:
+            session.headers.update(headers)
+        return session
+
+    def session(self, name: str, headers: Optional[dict[str, Any]] = None) -> TransportSession:
+        """按名称返回复用的会话，首次调用时使用 headers 创建。"""
+        with self._lock:
+            session = self._sessions.get(name)
+            if session is None:
+                session = self._sessions[name] = self.create_session(headers)
+            return session
+
+    def async_session(self, name: str, headers: Optional[dict[str, Any]] = None) -> aiohttp.ClientSession:
+        """
+        按名称返回当前事件循环中复用的 aiohttp 会话，必须在协程中调用。
+
+        连接超时和读取超时设置在会话上，请求时不要再传 timeout 覆盖；
+        aiohttp 会话不做传输层重试。
+        """
+        loop = asyncio.get_running_loop()
+        key = (name, id(loop))
+        with self._lock:
+            entry = self._async_sessions.get(key)
+            if entry is not None and entry[0] is loop and not entry[1].closed:
+                return entry[1]
+            connect_timeout, read_timeout = (
+                self.timeout if isinstance(self.timeout, tuple) else (self.timeout, self.timeout)
+            )
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_connections * self.pool_maxsize,
+                limit_per_host=self.pool_maxsize,
+                use_dns_cache=self.dns_cache.ttl > 0,
+                ttl_dns_cache=self.dns_cache.ttl if self.dns_cache.ttl > 0 else None,
+            )
+            session = aiohttp.ClientSession(
+                connector=connector,
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout),
+            )
+            self._async_sessions[key] = (loop, session)
+            return session
+
+    def close(self) -> None:
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            async_sessions = list(self._async_sessions.values())
+            self._async_sessions.clear()
+        self.adapter.close()
+        for loop, session in async_sessions:
+            # aiohttp 会话只能在所属的事件循环中关闭
+            if session.closed or loop.is_closed():
+                continue
+            try:
+                running = asyncio.get_running_loop()
+            except RuntimeError:
+                running = None
+            if running is loop:
+                loop.create_task(session.close())
+            elif loop.is_running():
+                asyncio.run_coroutine_threadsafe(session.close(), loop)
+
+
+_transport: Optional[HTTPTransport] = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> HTTPTransport:
+    """返回进程内共享的传输层，首次调用时使用默认配置创建。"""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = HTTPTransport()
+        return _transport
+
+
+def configure(**settings: Any) -> HTTPTransport:
+    """使用新的配置替换共享传输层，参数同 HTTPTransport。"""
+    global _transport
+    with _transport_lock:
+        previous = _transport
+        _transport = HTTPTransport(**settings)
+    if previous is not None:
+        previous.close()
+    return _transport
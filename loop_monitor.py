@@ -0,0 +1,206 @@
+"""
+事件循环阻塞检测。
+
+事件循环中每隔 interval 运行一次心跳，记录实际调度延迟（loop.lag）。
+后台线程检查心跳：超过 threshold 没有心跳时，说明有代码在事件循环线程中
+阻塞（同步网络请求、读大文件、CPU 密集计算等），立即抓取事件循环线程
+当前的调用栈，也就是阻塞发生的位置。事件循环恢复后记录这次阻塞的时长、
+调用栈，以及当时正在执行的命令（/img、/dy）和阶段（METRICS.timer 的名字）。
+
+命令和阶段保存在 contextvars 中，后台线程通过正在运行的任务读取它们
+（Task.get_context，Python 3.12+）。更早的版本无法读取任务的 Context，
+改为读取 stage_metrics.TASK_LABELS：run_command 和 METRICS.timer 把命令和
+阶段记在当前任务上，子任务通过 inherit_labels 沿用父任务的记录。
+
+不替换事件循环的任务工厂，开销只有心跳（默认每 50 ms 一次），也可以在
+运行时开关。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from stage_metrics import CURRENT_COMMAND, CURRENT_STAGE, METRICS, TASK_CONTEXT, TASK_LABELS, label_current_task
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 当前任务所属的命令（/img、/dy），定义在 stage_metrics 中，timer 记录阶段时一并读取
+COMMAND = CURRENT_COMMAND
+
+DEFAULT_THRESHOLD = 0.2
+DEFAULT_INTERVAL = 0.05
+# 阻塞超过该时长仍未恢复时先输出一次日志
+LONG_STALL = 5.0
+# 调用栈最多保留的帧数（从最内层开始）
+STACK_DEPTH = 12
+
+_ASYNCIO_DIR = os.path.dirname(asyncio.__file__)
+
+
+async def run_command(command: str, factory: Callable[[], Awaitable[T]]) -> T:
+    """以 command 的名义执行 factory()，其中创建的子任务也继承该命令。"""
+    COMMAND.set(command)
+    label_current_task(command)
+    return await factory()
+
+
+@dataclass
+class Stall:
+    """一次事件循环阻塞。"""
+
+    at: float
+    duration: float
+    command: Optional[str] = None
+    stage: Optional[str] = None
+    # 阻塞时事件循环线程的调用栈，最内层在最后
+    stack: list[str] = field(default_factory=list)
+
+    def describe(self) -> str:
+        return f"命令 {self.command or '未知'}，阶段 {self.stage or '未知'}"
+
+
+class LoopMonitor:
+    """事件循环阻塞检测器，start/stop 需要在事件循环线程中调用。"""
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, interval: float = DEFAULT_INTERVAL, history: int = 20):
+        self.threshold = float(threshold)
+        self.interval = float(interval)
+        self.stalls: deque[Stall] = deque(maxlen=history)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._beat = 0.0
+        self._beats = 0
+        # 后台线程在当前这次阻塞中抓到的信息：(心跳序号, Stall)
+        self._captured: Optional[tuple[int, Stall]] = None
+
+    @property
+    def running(self) -> bool:
+        return self._heartbeat_task is not None
+
+    def configure(self, threshold: Optional[float] = None, interval: Optional[float] = None) -> None:
+        if threshold is not None:
+            self.threshold = max(0.01, float(threshold))
+        if interval is not None:
+            self.interval = max(0.005, float(interval))
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._captured = None
+        self._stop = threading.Event()
+        self._heartbeat_task = self._loop.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, args=(self._stop,), name="loop-monitor", daemon=True)
+        self._watchdog.start()
+        logger.info(f"事件循环阻塞检测已开启，阈值 {self.threshold * 1000:.0f} ms")
+
+    def stop(self) -> None:
+        if not self.running:
+            return
+        self._stop.set()
+        self._heartbeat_task.cancel()
+        self._heartbeat_task = None
+        logger.info("事件循环阻塞检测已关闭")
+
+    async def _heartbeat(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            with self._lock:
+                self._beat = now
+                self._beats += 1
+                captured, self._captured = self._captured, None
+            METRICS.observe("loop.lag", lag)
+            if lag >= self.threshold:
+                self._record(lag, captured[1] if captured else None)
+
+    def _record(self, lag: float, stall: Optional[Stall]) -> None:
+        if stall is None:
+            # 后台线程没来得及抓到调用栈（阻塞刚好在检查间隔之间结束）
+            stall = Stall(at=time.time() - lag, duration=lag)
+        stall.duration = lag
+        self.stalls.append(stall)
+        METRICS.incr("loop.stalls")
+        METRICS.observe("loop.stall", lag)
+        stack = "".join(stall.stack) or "  （未抓到调用栈）\n"
+        logger.warning(f"事件循环阻塞 {lag * 1000:.0f} ms（{stall.describe()}），阻塞位置：\n{stack.rstrip()}")
+
+    def _watch(self, stop: threading.Event) -> None:
+        reported = None
+        while not stop.wait(min(self.interval, self.threshold / 2)):
+            with self._lock:
+                beats, blocked = self._beats, time.monotonic() - self._beat - self.interval
+                captured = self._captured
+            if blocked < self.threshold:
+                continue
+            if captured is None:
+                stall = self._capture(blocked)
+                with self._lock:
+                    if self._beats == beats:
+                        self._captured = (beats, stall)
+            elif blocked >= LONG_STALL and reported != beats:
+                reported = beats
+                stall = captured[1]
+                logger.warning(
+                    f"事件循环已阻塞 {blocked:.1f} 秒仍未恢复（{stall.describe()}），阻塞位置：\n"
+                    f"{''.join(stall.stack).rstrip()}"
+                )
+
+    def _capture(self, blocked: float) -> Stall:
+        """在后台线程中读取事件循环线程当前的调用栈和任务上下文。"""
+        stall = Stall(at=time.time() - blocked, duration=blocked)
+        frame = sys._current_frames().get(self._loop_thread)
+        if frame is not None:
+            frames = traceback.extract_stack(frame)
+            # 只保留 asyncio 内部调度之后的帧，即正在执行的任务的调用链
+            start = 0
+            for index, summary in enumerate(frames):
+                if summary.filename.startswith(_ASYNCIO_DIR):
+                    start = index + 1
+            stall.stack = traceback.format_list(frames[start:][-STACK_DEPTH:])
+        task = asyncio.current_task(self._loop)
+        if task is None:
+            return stall
+        if TASK_CONTEXT:
+            context = task.get_context()
+            stall.command = context.get(COMMAND)
+            stall.stage = context.get(CURRENT_STAGE)
+        else:
+            stall.command, stall.stage = TASK_LABELS.get(task, (None, None))
+        return stall
+
+    def summary(self) -> str:
+        """适合直接回复到聊天中的状态和最近几次阻塞。"""
+        state = "开启" if self.running else "关闭"
+        lines = [f"🩺 事件循环阻塞检测：{state}，阈值 {self.threshold * 1000:.0f} ms"]
+        if not self.stalls:
+            lines.append("没有检测到阻塞")
+        for stall in list(self.stalls)[-5:]:
+            at = time.strftime("%H:%M:%S", time.localtime(stall.at))
+            lines.append(f"{at} {stall.duration * 1000:.0f} ms，{stall.describe()}")
+            if stall.stack:
+                # 只显示最内层的一帧
+                lines.append(stall.stack[-1].strip().splitlines()[0])
+        return "\n".join(lines)
+
+
+MONITOR = LoopMonitor()
@@ -0,0 +1,245 @@
+"""
+上游服务的延迟感知容错：对冲请求与熔断器。
+
+- LatencyTracker 记录最近的成功请求耗时，给出 p95；
+- hedged() 在主请求超过对冲延迟（通常取 p95）仍未返回时再发一个请求，
+  先成功者胜出，另一个被取消，用少量额外请求换取更低的尾延迟；
+- CircuitBreaker 在连续失败达到阈值后打开，期间请求立即失败，
+  由后台探测任务定期检查上游是否恢复，恢复后自动关闭。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from stage_metrics import METRICS, inherit_labels
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 样本不足时使用的对冲延迟（秒）
+DEFAULT_HEDGE_DELAY = 1.0
+MIN_HEDGE_DELAY = 0.2
+MAX_HEDGE_DELAY = 5.0
+# 计算 p95 至少需要的样本数
+MIN_SAMPLES = 20
+
+
+class CircuitOpenError(Exception):
+    """熔断器打开，上游暂时不可用。"""
+
+    def __init__(self, name: str, retry_in: float):
+        self.retry_in = retry_in
+        super().__init__(f"{name} 暂时不可用，约 {max(1, round(retry_in))} 秒后恢复检测")
+
+
+class LatencyTracker:
+    """滑动窗口内的请求耗时，线程安全。"""
+
+    def __init__(self, window: int = 200):
+        self._samples: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def hedge_delay(self) -> float:
+        """对冲延迟：p95，限制在合理范围内。"""
+        p95 = self.percentile(95)
+        if p95 is None:
+            return DEFAULT_HEDGE_DELAY
+        return min(MAX_HEDGE_DELAY, max(MIN_HEDGE_DELAY, p95))
+
+
+async def hedged(
+    factory: Callable[[], Awaitable[T]],
+    delay: Optional[float],
+    tracker: Optional[LatencyTracker] = None,
+) -> T:
+    """
+    执行 factory()；超过 delay 秒仍未完成时再执行一次，返回先成功的结果。
+
+    两次都失败时抛出最后一个异常。delay 为 None 时不对冲。
+
+    factory 每次调用都应构造新的请求（例如重新生成加密 nonce）。tracker 只记录
+    主请求的耗时：对冲请求胜出时主请求尚未返回，记录它已经等待的时间（实际耗时
+    的下限）。只记录胜出者的耗时会让 p95 和对冲延迟逐渐偏低。
+    """
+    started = time.perf_counter()
+    attempts: dict[asyncio.Task, float] = {inherit_labels(asyncio.ensure_future(factory())): started}
+    hedge_sent = delay is None
+    error: Optional[BaseException] = None
+    try:
+        while attempts:
+            timeout = None if hedge_sent else max(0.0, started + delay - time.perf_counter())
+            done, _ = await asyncio.wait(attempts, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                hedge_sent = True
+                METRICS.incr("upstream.hedged")
+                attempts[inherit_labels(asyncio.ensure_future(factory()))] = time.perf_counter()
+                continue
+            for task in done:
+                attempt_started = attempts.pop(task)
+                if task.exception() is None:
+                    if tracker is not None:
+                        tracker.observe(time.perf_counter() - started)
+                    if attempt_started != started:
+                        METRICS.incr("upstream.hedge_won")
+                    return task.result()
+                error = task.exception()
+            # 唯一的请求已经失败时不再对冲，直接抛出
+            if not attempts:
+                break
+        raise error
+    finally:
+        for task in attempts:
+            task.cancel()
+
+
+class CircuitBreaker:
+    """
+    连续失败计数熔断器，线程安全。
+
+    关闭：正常放行；连续失败 failure_threshold 次后打开。
+    打开：直接抛出 CircuitOpenError。在事件循环中打开时启动后台探测任务，
+          探测成功后关闭；没有事件循环（同步调用）时，reset_timeout 后
+          放行一个试探请求（半开），成功则关闭，失败则重新打开。
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30,
+        max_reset_timeout: float = 300,
+        probe: Optional[Callable[[], Awaitable[object]]] = None,
+    ):
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = float(reset_timeout)
+        self.max_reset_timeout = float(max_reset_timeout)
+        self.probe = probe
+        self.state = self.CLOSED
+        self.failures = 0
+        self._retry_at = 0.0
+        self._backoff = self.reset_timeout
+        self._probe_task: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """请求前调用，熔断期间抛出 CircuitOpenError。"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            now = time.monotonic()
+            if self._probe_task is not None and self._probe_task.done():
+                # 探测任务所在的事件循环已经结束
+                self._probe_task = None
+            if self.state == self.OPEN and self._probe_task is None and now >= self._retry_at:
+                # 没有后台探测时，放行一个试探请求
+                self.state = self.HALF_OPEN
+                return
+            METRICS.incr("upstream.rejected")
+            raise CircuitOpenError(self.name, max(0.0, self._retry_at - now))
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"{self.name} 已恢复，熔断器关闭")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._backoff = self.reset_timeout
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED and self.failures >= self.failure_threshold
+            ):
+                self._open()
+
+    def _open(self) -> None:
+        if self.state != self.OPEN:
+            METRICS.incr("upstream.circuit_opened")
+            logger.warning(f"{self.name} 连续失败 {self.failures} 次，熔断 {self._backoff:.0f} 秒")
+        self.state = self.OPEN
+        self._retry_at = time.monotonic() + self._backoff
+        self._backoff = min(self.max_reset_timeout, self._backoff * 2)
+        if self.probe is not None and self._probe_task is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return
+            self._probe_task = loop.create_task(self._probe_loop())
+
+    async def _probe_loop(self) -> None:
+        try:
+            while True:
+                with self._lock:
+                    delay = self._retry_at - time.monotonic()
+                await asyncio.sleep(max(0.0, delay))
+                try:
+                    await self.probe()
+                except Exception as e:
+                    with self._lock:
+                        logger.info(f"{self.name} 探测失败：{str(e) or type(e).__name__}")
+                        self._retry_at = time.monotonic() + self._backoff
+                        self._backoff = min(self.max_reset_timeout, self._backoff * 2)
+                    continue
+                self.record_success()
+                return
+        finally:
+            with self._lock:
+                self._probe_task = None
+
+    def call_sync(
+        self,
+        func: Callable[[], T],
+        is_failure: Callable[[BaseException], bool] = lambda exc: True,
+    ) -> T:
+        """call 的同步版本，供线程中的阻塞请求使用。"""
+        self.before_call()
+        try:
+            result = func()
+        except Exception as exc:
+            if is_failure(exc):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        self.record_success()
+        return result
+
+    async def call(
+        self,
+        factory: Callable[[], Awaitable[T]],
+        is_failure: Callable[[BaseException], bool] = lambda exc: True,
+    ) -> T:
+        """在熔断器保护下执行 factory()，is_failure 决定哪些异常计入失败。"""
+        self.before_call()
+        try:
+            result = await factory()
+        except Exception as exc:
+            if is_failure(exc):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        self.record_success()
+        return result
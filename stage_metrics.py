@@ -0,0 +1,210 @@
+"""
+分阶段耗时与计数统计。
+
+为 /img、/dy 的各个阶段（文章下载、HTML 解析、图片下载、哈希、发送、auth、
+parse、解密等）记录耗时直方图，并统计计数器与缓存命中率。所有方法线程安全，
+可以在线程池中调用。
+
+    with METRICS.timer("img.article_fetch"):
+        ...
+    METRICS.incr("img.sent")
+    METRICS.cache("article", hit=True)
+
+timer 同时把阶段名记录在 CURRENT_STAGE 中，供事件循环阻塞检测归因。
+Python 3.12 之前其他线程无法读取任务的 Context，timer 还会把
+(命令, 阶段) 记在当前任务上（TASK_LABELS），新建的子任务用 inherit_labels
+沿用父任务的记录。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import bisect
+import contextlib
+import contextvars
+import json
+import sys
+import threading
+import time
+import weakref
+from typing import Any, Iterator, Optional
+
+# 直方图桶的上界（毫秒），最后一个桶收纳所有更慢的样本
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000)
+
+# 当前任务（或线程）所在的最内层 timer 阶段
+CURRENT_STAGE: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("stage", default=None)
+# 当前任务所属的命令（/img、/dy），由 loop_monitor.run_command 设置
+CURRENT_COMMAND: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("command", default=None)
+
+# Python 3.12 起可以通过 Task.get_context() 读取任务的命令和阶段
+TASK_CONTEXT = sys.version_info >= (3, 12)
+# 更早的版本：每个任务当前的 (命令, 阶段)
+TASK_LABELS: weakref.WeakKeyDictionary[asyncio.Task, tuple[Optional[str], Optional[str]]] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _current_task() -> Optional[asyncio.Task]:
+    try:
+        return asyncio.current_task()
+    except RuntimeError:
+        # 线程池中没有运行的事件循环
+        return None
+
+
+def label_current_task(command: Optional[str], stage: Optional[str] = None) -> None:
+    """Python 3.12 之前记下当前任务的命令和阶段。"""
+    if TASK_CONTEXT:
+        return
+    task = _current_task()
+    if task is not None:
+        TASK_LABELS[task] = (command, stage)
+
+
+def inherit_labels(task: asyncio.Future) -> asyncio.Future:
+    """新建的子任务沿用当前任务的命令和阶段，返回 task 本身。"""
+    if not TASK_CONTEXT:
+        parent = _current_task()
+        label = TASK_LABELS.get(parent) if parent is not None else None
+        if label is not None and isinstance(task, asyncio.Task):
+            TASK_LABELS[task] = label
+    return task
+
+
+class Histogram:
+    """固定桶的延迟直方图。"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, ms: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, pct: float) -> float:
+        """返回分位数所在桶的上界（毫秒），落在最后一个桶时返回最大值。"""
+        if not self.count:
+            return 0.0
+        rank = pct / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return float(BUCKETS_MS[index]) if index < len(BUCKETS_MS) else self.max
+        return self.max
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max, 3),
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "buckets": {
+                (f"le_{BUCKETS_MS[i]}" if i < len(BUCKETS_MS) else "inf"): count
+                for i, count in enumerate(self.counts)
+                if count
+            },
+        }
+
+
+class Metrics:
+    """阶段耗时、计数器和缓存命中统计。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms: dict[str, Histogram] = {}
+            self._counters: dict[str, int] = {}
+            self._caches: dict[str, list[int]] = {}
+            self._started = time.time()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram()
+            histogram.observe(seconds * 1000)
+
+    @contextlib.contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        """记录 with 代码块的耗时，也可以包住 await。"""
+        token = CURRENT_STAGE.set(stage)
+        task = None if TASK_CONTEXT else _current_task()
+        previous = None
+        if task is not None:
+            previous = TASK_LABELS.get(task)
+            TASK_LABELS[task] = (CURRENT_COMMAND.get(), stage)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+            CURRENT_STAGE.reset(token)
+            if task is not None:
+                if previous is None:
+                    TASK_LABELS.pop(task, None)
+                else:
+                    TASK_LABELS[task] = previous
+
+    def incr(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def cache(self, name: str, hit: bool) -> None:
+        with self._lock:
+            stats = self._caches.setdefault(name, [0, 0])
+            stats[0 if hit else 1] += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        """返回可 JSON 序列化的完整统计。"""
+        with self._lock:
+            return {
+                "since": self._started,
+                "uptime_s": round(time.time() - self._started, 1),
+                "stages": {name: h.snapshot() for name, h in sorted(self._histograms.items())},
+                "counters": dict(sorted(self._counters.items())),
+                "caches": {
+                    name: {
+                        "hits": hits,
+                        "misses": misses,
+                        "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+                    }
+                    for name, (hits, misses) in sorted(self._caches.items())
+                },
+            }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), ensure_ascii=False, separators=(",", ":"))
+
+    def summary(self) -> str:
+        """适合直接回复到聊天中的简要统计。"""
+        snapshot = self.snapshot()
+        lines = [f"📊 运行 {snapshot['uptime_s']:.0f} 秒"]
+        if snapshot["stages"]:
+            lines.append("阶段 次数 平均/p50/p99(ms)")
+            for name, stage in snapshot["stages"].items():
+                lines.append(
+                    f"{name} {stage['count']} "
+                    f"{stage['avg_ms']:.0f}/{stage['p50_ms']:.0f}/{stage['p99_ms']:.0f}"
+                )
+        if snapshot["caches"]:
+            lines.append("缓存 命中/未命中")
+            for name, stats in snapshot["caches"].items():
+                lines.append(f"{name} {stats['hits']}/{stats['misses']} ({stats['hit_rate']:.0%})")
+        if snapshot["counters"]:
+            lines.append("计数 " + " ".join(f"{name}={value}" for name, value in snapshot["counters"].items()))
+        return "\n".join(lines)
+
+
+METRICS = Metrics()